@@ -3,39 +3,190 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify
-from flask_migrate import Migrate
+import base64
+import gc
+import hashlib
+import os
+import secrets
+from functools import lru_cache, wraps
+from flask import Flask, Blueprint, current_app, render_template, stream_template, request, Response, flash, redirect, url_for, abort, jsonify, g, session, make_response
+from flask.cli import with_appcontext
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
+from werkzeug.local import LocalProxy
+from assets import Assets, build as build_asset_files
+from cache import ResponseCache
+from compression import Compression
+from importer import import_file, format_report
+from dbpool import engine_options, statement_timeout_per_transaction, pool_stats, dispose_after_fork
+from sqlstats import SqlStats
+from counters import UpcomingCountRefresher, refresh_upcoming_counts, venue_upcoming_shows, artist_upcoming_shows, venue_facets, artist_facets
+from partitions import PartitionMaintainer, create_show_partitions, detach_show_partitions
+from replicas import ReplicaRouter, RoutingSession
+from geocode import Geocoder, geocode_table
 from sqlalchemy.dialects import postgresql
-from sqlalchemy import func, DateTime
-from datetime import datetime
+from sqlalchemy import and_, cast, delete, event, false, func, insert, literal, or_, select, text, true, tuple_, union_all, DateTime
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+from itertools import groupby
 import sys
+import click
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+# Babel, dateutil, the WTForms forms and Flask-Migrate (with Alembic) are
+# imported where they are first used, so workers and CLI commands that never
+# need them start without loading them.
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
+moment = Moment()
+# RoutingSession sends reads to the replica bind when the request may use it.
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Count and time the SQL each request runs; see sqlstats.py.
+sql_stats = SqlStats()
+
+# Keep the materialized upcoming show counts fresh; see counters.py.
+upcoming_count_refresher = UpcomingCountRefresher()
+
+# Keep future monthly partitions of show created; see partitions.py.
+partition_maintainer = PartitionMaintainer()
+
+# Route GET traffic to the read replica while it keeps up; see replicas.py.
+replica_router = ReplicaRouter()
+
+# Venue and artist coordinates from offline gazetteer files; see geocode.py.
+geocoder = Geocoder()
+
+# Fingerprinted static bundles; see assets.py.
+assets = Assets()
+
+# Brotli/gzip for rendered pages and JSON; see compression.py.
+compression = Compression()
+
+# Views recorded by @route and added to each app by create_app. A blueprint
+# would prefix every endpoint, and templates link to them by bare name.
+routes = []
+
+def route(rule, **options):
+  def decorator(view):
+    routes.append((rule, view, options))
+    return view
+  return decorator
+
+def create_app(config_object='config', preload=False):
+  app = Flask(__name__)
+  app.config.from_object(config_object)
+  if not app.config['SECRET_KEY']:
+    if not app.debug:
+      raise RuntimeError('SECRET_KEY must be set; sessions and flashes are shared by all workers.')
+    # Sessions and flashes then last as long as this process.
+    app.config['SECRET_KEY'] = secrets.token_hex(32)
+    app.logger.warning('SECRET_KEY is not set; using a random key for this process.')
+  app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+  moment.init_app(app)
+  db.init_app(app)
+  with app.app_context():
+    # Connections opened before a fork (e.g. during preload) must never be
+    # shared with the forked workers.
+    dispose_after_fork(db.engine)
+
+  if app.config['DATABASE_PGBOUNCER'] and app.config['DATABASE_STATEMENT_TIMEOUT']:
+    with app.app_context():
+      for engine in db.engines.values():
+        statement_timeout_per_transaction(RoutingSession, engine, app.config['DATABASE_STATEMENT_TIMEOUT'])
+
+  # Only 'flask db' needs Flask-Migrate, and loading it pulls in Alembic; a
+  # click context is active only when the app is built by the flask command.
+  if click.get_current_context(silent=True) is not None:
+    from flask_migrate import Migrate
+    Migrate(app, db)
+
+  sql_stats.init_app(app, db)
+  upcoming_count_refresher.init_app(app, db)
+  partition_maintainer.init_app(app, db)
+  replica_router.init_app(app, db)
+  geocoder.init_app(app)
+  assets.init_app(app)
+  compression.init_app(app)
+  app.extensions['response_cache'] = ResponseCache(
+    max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+    max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES'],
+    ttl=app.config['RESPONSE_CACHE_TTL']
+  )
+  app.jinja_env.filters['datetime'] = datetime_filter(app.config['DATETIME_FORMAT_CACHE_SIZE'])
+  app.jinja_env.globals['page_url'] = page_url
+
+  for rule, view, options in routes:
+    app.add_url_rule(rule, view_func=view, **options)
+  app.register_blueprint(api)
+  app.register_error_handler(404, not_found_error)
+  app.register_error_handler(500, server_error)
+  for command in (import_catalog, refresh_counts, maintain_partitions, geocode_catalog, build_assets):
+    app.cli.add_command(command)
+
+  if not app.debug:
+    file_handler = FileHandler('error.log')
+    file_handler.setFormatter(
+        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+    )
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
+    app.logger.info('errors')
 
-# connect to a local postgresql database
-migrate = Migrate(app, db)
+  if preload:
+    warm_up(app)
+  return app
+
+def warm_up(app):
+  # For a preloading server (see gunicorn.conf.py): load everything a worker
+  # would otherwise load on its first requests, then move all objects into the
+  # permanent GC generation. The collector then never writes to those pages,
+  # so forked workers keep sharing them copy-on-write.
+  import forms
+  import babel.dates
+  import dateutil.parser
+  for name in app.jinja_env.list_templates():
+    if name.endswith('.html'):
+      app.jinja_env.get_template(name)
+  app.jinja_env.filters['datetime'](datetime(2000, 1, 1), 'full')
+  if geocoder.paths:
+    geocoder.gazetteer
+  gc.collect()
+  gc.freeze()
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+# Length of a show scheduled without one.
+SHOW_DEFAULT_DURATION = timedelta(hours=2)
+
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+      db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+      # Narrows availability searches to the venues seeking talent in an area.
+      db.Index('ix_venue_seeking_state_city', 'state', text('lower(city)'), postgresql_where=text('seeking_talent')),
+      # Faceted browsing: genre containment and area filters.
+      db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+      db.Index('ix_venue_state_city', 'state', text('lower(city)')),
+      # The keyset pagination order of the /venues listing (VENUE_AREA_KEYS).
+      db.Index('ix_venue_state_city_name_id', 'state', 'city', 'name', 'id'),
+      # Radius and nearest-venue searches (earthdistance, migration e9a3c7b1d624).
+      db.Index('ix_venue_location', text('ll_to_earth(latitude, longitude)'), postgresql_using='gist'),
+      db.CheckConstraint('latitude BETWEEN -90 AND 90 AND longitude BETWEEN -180 AND 180', name='venue_location_check'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), unique=True, nullable=False)
@@ -49,7 +200,24 @@ class Venue(db.Model):
     website = db.Column(db.String(500))
     seeking_talent = db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String)
-    artists = db.relationship('Artist', secondary='show', backref=db.backref('venues', lazy=True))
+    # Where the venue's ZIP code or city is, set by locate(); None until found.
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # Read-only: show has a row per performance, not per (artist, venue) pair,
+    # so shows are written and deleted through Show itself.
+    artists = db.relationship('Artist', secondary='show', viewonly=True,
+      backref=db.backref('venues', lazy=True, viewonly=True))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False)
+
+    # Incremented by SQLAlchemy on every UPDATE; feeds the page ETag.
+    __mapper_args__ = {'version_id_col': version}
+
+    def locate(self):
+      # Place the venue from its address and city; without a gazetteer
+      # configured the coordinates are left for 'flask geocode'.
+      if geocoder.paths:
+        self.latitude, self.longitude = geocoder.locate(self.city, self.state, self.address) or (None, None)
 
     def __repr__(self):
       return (
@@ -62,6 +230,14 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+      db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+      # Faceted browsing: genre containment and area filters.
+      db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+      db.Index('ix_artist_state_city', 'state', text('lower(city)')),
+      db.Index('ix_artist_location', text('ll_to_earth(latitude, longitude)'), postgresql_using='gist'),
+      db.CheckConstraint('latitude BETWEEN -90 AND 90 AND longitude BETWEEN -180 AND 180', name='artist_location_check'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), unique=True, nullable=False)
@@ -74,6 +250,16 @@ class Artist(db.Model):
     website = db.Column(db.String(500))
     seeking_venue = db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False)
+
+    __mapper_args__ = {'version_id_col': version}
+
+    def locate(self):
+      if geocoder.paths:
+        self.latitude, self.longitude = geocoder.locate(self.city, self.state) or (None, None)
 
     def __repr__(self):
       return (
@@ -86,11 +272,31 @@ class Artist(db.Model):
 
 # Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 class Show(db.Model):
-    __tabelname__ = 'show'
+    # Range partitioned by month of start_time (see partitions.py), which is
+    # why start_time is part of the primary key.
+    __tablename__ = 'show'
+    __table_args__ = (
+      # Composite indexes so a venue's or artist's schedule is an index range
+      # scan; the other id is included so the scan never visits the heap.
+      db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time', postgresql_include=['artist_id']),
+      db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time', postgresql_include=['venue_id']),
+      # The keyset pagination order of the /shows listing (SHOW_LIST_KEYS).
+      db.Index('ix_show_start_time_artist_id_venue_id', 'start_time', 'artist_id', 'venue_id'),
+      # Overlapping shows at one venue are rejected by an exclusion constraint
+      # on each partition and a trigger for shows crossing a month boundary
+      # (migration a9c4e1f7b352), which the cap on duration keeps cheap.
+      db.CheckConstraint("duration > interval '0' AND duration <= interval '24 hours'", name='show_duration_check'),
+    )
 
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), primary_key=True)
-    start_time = db.Column(db.DateTime, default=db.func.now())
+    start_time = db.Column(db.DateTime, primary_key=True, default=db.func.now())
+    duration = db.Column(db.Interval, nullable=False, default=SHOW_DEFAULT_DURATION,
+      server_default=text("interval '2 hours'"))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False)
+
+    __mapper_args__ = {'version_id_col': version}
 
     def __repr__(self):
       return (
@@ -101,21 +307,620 @@ class Show(db.Model):
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format):
+  # Compiled Babel pattern for a named or literal format; only a handful exist.
+  import babel.dates
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+@lru_cache(maxsize=None)
+def datetime_locale(locale):
+  import babel
+  return babel.Locale.parse(locale)
+
+def datetime_filter(cache_size):
+  # The 'datetime' template filter, with its own cache of cache_size entries.
+  @lru_cache(maxsize=cache_size)
+  def cached_format_datetime(value, format):
+    # Shows cluster on a few start times, so formatted output is memoized per timestamp.
+    import babel.dates
+    return datetime_pattern(format).apply(value, datetime_locale(babel.dates.LC_TIME))
+
+  def format_datetime(value, format='medium'):
+    # Accepts datetime objects directly; strings are parsed once for older callers.
+    if not isinstance(value, datetime):
+      import dateutil.parser
+      value = dateutil.parser.parse(value)
+    return cached_format_datetime(value, format)
+  return format_datetime
+
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+def encode_cursor(values):
+  # Opaque page cursor: the sort key values of a boundary row as url-safe base64 JSON.
+  raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+  return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, keys):
+  # Returns the sort key values for keys, or None if the cursor is missing or malformed.
+  if not cursor:
+    return None
+  try:
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    if len(values) != len(keys):
+      return None
+    return [datetime.fromisoformat(value) if isinstance(key.type, DateTime) else value
+      for key, value in zip(keys, values)]
+  except (ValueError, TypeError):
+    return None
+
+def page_args(args, **changes):
+  # Request arguments for a link to another page of the same listing: the
+  # filters are kept, the page cursor is dropped and changes are applied (None
+  # removes an argument).
+  merged = {key: values for key, values in args.lists() if key not in ('after', 'before')}
+  for key, value in changes.items():
+    if value is None:
+      merged.pop(key, None)
+    else:
+      merged[key] = value
+  return merged
+
+def page_url(**changes):
+  return url_for(request.endpoint, **request.view_args, **page_args(request.args, **changes))
+
+def page_size(args=None):
+  # Page size from the limit request argument, bounded by config.
+  args = request.args if args is None else args
+  limit = args.get('limit', current_app.config['PAGE_SIZE'], type=int)
+  return max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+
+def keyset_page(statement, keys, after=None, before=None, limit=None):
+  # Keyset pagination: filter on the sort key tuple instead of using OFFSET, so
+  # every page is an index range scan. keys must uniquely order the rows and
+  # each key must be selected by the statement under its own column name.
+  statement, bounds = keyset_statement(statement, keys, after, before, limit)
+  return keyset_rows(db.session.execute(statement).all(), bounds)
+
+def keyset_statement(statement, keys, after=None, before=None, limit=None):
+  # The filtered, ordered and limited select for one page, and the bounds
+  # keyset_rows needs to trim the fetched rows and build the page cursors.
+  limit = limit or page_size()
+  sortKey = tuple_(*keys)
+  afterValues = decode_cursor(after, keys)
+  beforeValues = None if afterValues else decode_cursor(before, keys)
+
+  if beforeValues:
+    statement = statement.where(sortKey < tuple_(*beforeValues)).order_by(*[key.desc() for key in keys])
+  else:
+    if afterValues:
+      statement = statement.where(sortKey > tuple_(*afterValues))
+    statement = statement.order_by(*keys)
+  return statement.limit(limit + 1), (keys, limit, afterValues, beforeValues)
+
+def keyset_rows(rows, bounds):
+  keys, limit, afterValues, beforeValues = bounds
+  hasMore = len(rows) > limit
+  rows = rows[:limit]
+  if beforeValues:
+    rows.reverse()
+
+  page = {"next": None, "prev": None}
+  if rows:
+    firstCursor = encode_cursor([getattr(rows[0], key.key) for key in keys])
+    lastCursor = encode_cursor([getattr(rows[-1], key.key) for key in keys])
+    if beforeValues:
+      page["prev"] = firstCursor if hasMore else None
+      page["next"] = lastCursor
+    else:
+      page["prev"] = firstCursor if afterValues else None
+      page["next"] = lastCursor if hasMore else None
+  return rows, page
+
+VENUE_AREA_KEYS = [Venue.state, Venue.city, Venue.name, Venue.id]
+VENUE_NAME_KEYS = [Venue.name, Venue.id]
+ARTIST_LIST_KEYS = [Artist.name, Artist.id]
+SHOW_LIST_KEYS = [Show.start_time, Show.artist_id, Show.venue_id]
+
+def venue_areas_statement(conditions=()):
+  # Venues with their materialized upcoming show counts, in one statement.
+  num_upcoming_shows = func.coalesce(venue_upcoming_shows.c.num_upcoming_shows, 0)
+  return select(Venue.state, Venue.city, Venue.id, Venue.name, num_upcoming_shows.label('num_upcoming_shows'))\
+    .outerjoin(venue_upcoming_shows, venue_upcoming_shows.c.venue_id==Venue.id).where(*conditions)
+
+def venue_areas(after=None, before=None, conditions=()):
+  # Fetch a page of venues with their upcoming show counts. Rows are ordered by
+  # state and city so each area's venues are adjacent and can be folded into
+  # the structure pages/venues.html expects.
+  rows, page = keyset_page(venue_areas_statement(conditions), VENUE_AREA_KEYS, after, before)
+  return fold_venue_areas(rows), page
+
+def fold_venue_areas(rows):
+  areas = []
+  for (state, city), areaRows in groupby(rows, key=lambda row: (row.state, row.city)):
+    areas.append({
+      "city": city,
+      "state": state,
+      "venues": [{
+        "id": row.id,
+        "name": row.name,
+        "num_upcoming_shows": row.num_upcoming_shows
+      } for row in areaRows]
+    })
+  return areas
+
+def similarity_threshold():
+  # Transaction-local pg_trgm threshold for the % operator in search_statement.
+  return text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)")\
+    .bindparams(threshold=str(current_app.config['SEARCH_SIMILARITY_THRESHOLD']))
+
+def search_statement(model, search_term, conditions=()):
+  # Ranked fuzzy search on model.name, backed by its pg_trgm GIN index. Substring
+  # matches rank first, then everything above the similarity threshold by
+  # similarity, so near-misses still return results.
+  substringMatch = model.name.ilike('%' + search_term + '%')
+  return select(model.id, model.name)\
+    .where(or_(substringMatch, model.name.op('%')(search_term)), *conditions)\
+    .order_by(substringMatch.desc(), func.similarity(model.name, search_term).desc(), model.name)\
+    .limit(current_app.config['SEARCH_RESULT_LIMIT'])
+
+def search_by_name(model, search_term, conditions=()):
+  db.session.execute(similarity_threshold())
+  return db.session.execute(search_statement(model, search_term, conditions)).all()
+
+def entity_validators_statement(model, showKey, entity_id, current_time):
+  # A venue or artist together with what its detail page depends on: the
+  # latest change to its shows and to the artists or venues they link to
+  # (whose names and images the page shows), how many shows there are and how
+  # many are upcoming (which changes as time passes without any write).
+  linked, linkedKey = (Artist, Show.artist_id) if model is Venue else (Venue, Show.venue_id)
+  return select(model, func.max(Show.updated_at), func.max(linked.updated_at), func.count(showKey),
+      func.count(showKey).filter(Show.start_time>current_time))\
+    .outerjoin(Show, showKey==model.id).outerjoin(linked, linkedKey==linked.id)\
+    .where(model.id==entity_id).group_by(model.id)
+
+def entity_validators(model, showKey, entity_id, current_time):
+  # Returns the entity, a strong ETag and the Last-Modified time, or
+  # (None, None, None) if there is no such entity.
+  row = db.session.execute(entity_validators_statement(model, showKey, entity_id, current_time)).first()
+  return validators_from_row(model, row)
+
+def validators_from_row(model, row):
+  if row is None:
+    return None, None, None
+
+  entity, showsUpdatedAt, linkedUpdatedAt, showCount, upcomingCount = row
+  lastModified = max(value for value in (entity.updated_at, showsUpdatedAt, linkedUpdatedAt) if value is not None)
+  etag = hashlib.sha1(
+    f'{model.__tablename__}:{entity.id}:{entity.version}:{showsUpdatedAt}:{linkedUpdatedAt}:{showCount}:{upcomingCount}'.encode('utf-8')
+  ).hexdigest()
+  return entity, etag, lastModified
+
+def request_not_modified(etag, last_modified, current_request=None):
+  # If-None-Match takes precedence over If-Modified-Since.
+  current_request = request if current_request is None else current_request
+  if current_request.if_none_match:
+    return current_request.if_none_match.contains_weak(etag)
+  if current_request.if_modified_since:
+    return last_modified.replace(microsecond=0) <= current_request.if_modified_since.replace(tzinfo=None)
+  return False
+
+def with_validators(response, etag, last_modified):
+  response = make_response(response)
+  response.set_etag(etag)
+  response.last_modified = last_modified
+  return response
+
+def venue_schedule(venue_id):
+  return select(Artist.id, Artist.name, Artist.image_link, Show.start_time).select_from(Show).join(Artist)\
+    .where(Show.venue_id==venue_id).order_by(Show.start_time)
+
+def venue_detail(venue, current_time, schedule=None):
+  # Page data for show_venue. The whole schedule comes from one ordered query
+  # (run here unless the caller already has its rows) and is split into past
+  # and upcoming shows in a single pass.
+  past_shows = []
+  upcoming_shows = []
+  if schedule is None:
+    schedule = db.session.execute(venue_schedule(venue.id)).all()
+
+  for show in schedule:
+    if show.start_time is None or show.start_time == current_time:
+      continue
+    showObj = {
+      "artist_id": show.id,
+      "artist_name": show.name,
+      "artist_image_link": show.image_link,
+      "start_time": show.start_time
+    }
+    if show.start_time < current_time:
+      past_shows.append(showObj)
+    else:
+      upcoming_shows.append(showObj)
+
+  return {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": venue.genres,
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows)
+  }
+
+def artist_schedule(artist_id):
+  return select(Venue.id, Venue.name, Venue.image_link, Show.start_time).select_from(Show).join(Venue)\
+    .where(Show.artist_id==artist_id).order_by(Show.start_time)
+
+def artist_detail(artist, current_time, schedule=None):
+  # Page data for show_artist, built the same way as venue_detail.
+  past_shows = []
+  upcoming_shows = []
+  if schedule is None:
+    schedule = db.session.execute(artist_schedule(artist.id)).all()
+
+  for show in schedule:
+    if show.start_time is None or show.start_time == current_time:
+      continue
+    showObj = {
+      "venue_id": show.id,
+      "venue_name": show.name,
+      "venue_image_link": show.image_link,
+      "start_time": show.start_time
+    }
+    if show.start_time < current_time:
+      past_shows.append(showObj)
+    else:
+      upcoming_shows.append(showObj)
+
+  return {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": artist.genres,
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows)
+  }
+
+def artist_list_statement():
+  return select(Artist.id, Artist.name)
+
+def artist_list(after=None, before=None):
+  artists, page = keyset_page(artist_list_statement(), ARTIST_LIST_KEYS, after, before)
+  return shape_artist_list(artists), page
+
+def shape_artist_list(artists):
+  return [{"id": artist.id, "name": artist.name} for artist in artists]
+
+def show_list_statement():
+  return select(Show.venue_id, Venue.name.label('venue_name'), Show.artist_id, Artist.name, Artist.image_link, Show.start_time)\
+    .select_from(Show).join(Venue).join(Artist)
+
+def show_list(after=None, before=None):
+  shows, page = keyset_page(show_list_statement(), SHOW_LIST_KEYS, after, before)
+  return shape_show_list(shows), page
+
+def shape_show_list(shows):
+  return [{
+    "venue_id": show.venue_id,
+    "venue_name": show.venue_name,
+    "artist_id": show.artist_id,
+    "artist_name": show.name,
+    "artist_image_link": show.image_link,
+    "start_time": show.start_time
+  } for show in shows]
+
+def stream_shows():
+  # Every show in start time order from a server-side cursor, fetched in
+  # batches so memory stays flat however long the history is. The session is
+  # closed when the generator is exhausted or discarded.
+  query = Show.query.join(Venue).join(Artist)\
+    .with_entities(Show.venue_id, Venue.name.label('venue_name'), Show.artist_id, Artist.name, Artist.image_link, Show.start_time)\
+    .order_by(Show.start_time, Show.artist_id, Show.venue_id)\
+    .execution_options(stream_results=True)\
+    .yield_per(current_app.config['SHOWS_STREAM_BATCH_SIZE'])
+  try:
+    for show in query:
+      yield {
+        "venue_id": show.venue_id,
+        "venue_name": show.venue_name,
+        "artist_id": show.artist_id,
+        "artist_name": show.name,
+        "artist_image_link": show.image_link,
+        "start_time": show.start_time
+      }
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+
+def upcoming_show_counts(counts, ids):
+  # Materialized upcoming show counts for a whole result set in one query.
+  # counts is venue_upcoming_shows or artist_upcoming_shows; ids without
+  # upcoming shows are absent from the result, so callers should default to 0.
+  if not ids:
+    return {}
+  return dict(db.session.execute(upcoming_counts_statement(counts, ids)).all())
+
+def upcoming_counts_statement(counts, ids):
+  key = counts.c.venue_id if 'venue_id' in counts.c else counts.c.artist_id
+  return select(key, counts.c.num_upcoming_shows).where(key.in_(ids))
+
+def search_results(model, counts, search_term, conditions=()):
+  # Ranked name matches with their upcoming show counts, shaped as the search
+  # pages expect. Returns {} when nothing matches.
+  matches = search_by_name(model, search_term, conditions)
+  if not matches:
+    return {}
+  return shape_search_results(matches, upcoming_show_counts(counts, [match.id for match in matches]))
+
+def shape_search_results(matches, showCounts):
+  return {
+    "count": len(matches),
+    "data": [{
+      "id": match.id,
+      "name": match.name,
+      "num_upcoming_shows": showCounts.get(match.id, 0)
+    } for match in matches]
+  }
+
+def venue_availability_statement(city, state, genres, start, end):
+  # Venues seeking talent with no show overlapping [start, end), optionally in
+  # one city/state and taking any of genres. The NOT EXISTS probe is answered
+  # by each partition's exclusion constraint index on (venue_id, show time
+  # range); the start_time bounds, valid since no show lasts over 24 hours,
+  # prune it to the partitions the window can touch.
+  booked = select(Show.venue_id).where(
+    Show.venue_id==Venue.id,
+    Show.start_time>start - timedelta(hours=24),
+    Show.start_time<end,
+    func.tsrange(Show.start_time, Show.start_time + Show.duration).op('&&')(func.tsrange(start, end))
+  )
+  statement = select(Venue.id, Venue.name, Venue.city, Venue.state, Venue.genres)\
+    .where(Venue.seeking_talent, ~booked.exists())
+  if state:
+    statement = statement.where(Venue.state==state)
+  if city:
+    statement = statement.where(func.lower(Venue.city)==city.strip().lower())
+  if genres:
+    statement = statement.where(Venue.genres.overlap(genre_array(Venue, genres)))
+  return statement.order_by(Venue.name, Venue.id).limit(current_app.config['AVAILABILITY_RESULT_LIMIT'])
+
+def shape_available_venues(rows):
+  return [{
+    "id": row.id,
+    "name": row.name,
+    "city": row.city,
+    "state": row.state,
+    "genres": row.genres
+  } for row in rows]
+
+def available_venues(city, state, genres, start, end):
+  statement = venue_availability_statement(city, state, genres, start, end)
+  return shape_available_venues(db.session.execute(statement).all())
+
+def genre_array(model, genres):
+  # Typed like the column: compared with a text[] parameter, the varchar[]
+  # column would be cast and its GIN index ignored.
+  return cast(genres, model.genres.type)
+
+def browse_conditions(model, seeking, args):
+  # Filters from request arguments: every one of genres, state, city and
+  # seeking=1 for venues seeking talent or artists seeking venues.
+  conditions = []
+  genres = args.getlist('genres')
+  if genres:
+    conditions.append(model.genres.contains(genre_array(model, genres)))
+  if args.get('state'):
+    conditions.append(model.state==args['state'])
+  if args.get('city'):
+    conditions.append(func.lower(model.city)==args['city'].strip().lower())
+  if args.get('seeking') == '1':
+    conditions.append(seeking.is_(True))
+  return conditions
+
+def facet_statement(model, seeking, conditions):
+  # Counts per genre and per state, the total and how many are seeking among
+  # the rows matching conditions, in one statement. The filters use the GIN
+  # index on genres and the (state, lower(city)) index, so only the matching
+  # rows are counted.
+  matches = select(model.state, model.genres, seeking.label('seeking')).where(*conditions).cte('matches')
+  genre = func.unnest(matches.c.genres).table_valued('value').render_derived(name='genre')
+  return union_all(
+    select(literal('genre').label('facet'), genre.c.value.label('value'), func.count().label('count'))
+      .select_from(matches).join(genre, true()).group_by(genre.c.value),
+    select(literal('state'), matches.c.state, func.count()).group_by(matches.c.state),
+    select(literal('total'), literal(''), func.count()).select_from(matches),
+    select(literal('seeking'), literal(''), func.count().filter(matches.c.seeking)).select_from(matches)
+  )
+
+def shape_facets(rows):
+  facets = {"total": 0, "seeking": 0, "genres": [], "states": []}
+  for facet, value, count in rows:
+    if facet in ('total', 'seeking'):
+      facets[facet] = count
+    else:
+      facets[facet + 's'].append({"value": value, "count": count})
+  for name in ('genres', 'states'):
+    facets[name].sort(key=lambda facet: (-facet['count'], facet['value']))
+  return facets
+
+def browse_statement(model, conditions):
+  return select(model.id, model.name, model.city, model.state, model.genres).where(*conditions)
+
+def shape_browse_list(rows):
+  return [{
+    "id": row.id,
+    "name": row.name,
+    "city": row.city,
+    "state": row.state,
+    "genres": row.genres
+  } for row in rows]
+
+def browse(model, seeking, facetView, keys, args):
+  # A page of model rows matching the filters in args, with facet counts.
+  # Unfiltered counts come from the materialized facetView, since counting
+  # the whole table on every visit does not stay fast as it grows.
+  conditions = browse_conditions(model, seeking, args)
+  rows, page = keyset_page(browse_statement(model, conditions), keys, args.get('after'), args.get('before'))
+  if conditions:
+    facetRows = db.session.execute(facet_statement(model, seeking, conditions)).all()
+  else:
+    facetRows = db.session.execute(select(facetView.c.facet, facetView.c.value, facetView.c.count)).all()
+  return shape_browse_list(rows), shape_facets(facetRows), page
+
+METERS_PER_MILE = 1609.344
+
+def request_origin(args):
+  # (latitude, longitude) to search around: the lat and lng arguments, or the
+  # place named by near, e.g. 'Austin, TX' or a ZIP code. None if neither is
+  # given or the place is not in the gazetteer.
+  latitude, longitude = args.get('lat', type=float), args.get('lng', type=float)
+  if latitude is not None and longitude is not None:
+    if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+      return latitude, longitude
+    return None
+  return geocoder.locate_query(args.get('near', ''))
+
+def request_miles(args):
+  # Search radius from the within argument, in miles, bounded by config.
+  miles = args.get('within', current_app.config['NEAR_DEFAULT_MILES'], type=float)
+  return max(0.0, min(miles, current_app.config['NEAR_MAX_MILES']))
+
+def earth_location(model):
+  # The indexed expression of ix_venue_location and ix_artist_location.
+  return func.ll_to_earth(model.latitude, model.longitude)
+
+def within_radius(model, origin, miles):
+  # Rows within miles of origin. earth_box is the cube the GiST index can
+  # answer, but it is a box around the circle, so earth_distance drops its
+  # corners.
+  center = func.ll_to_earth(*origin)
+  meters = miles * METERS_PER_MILE
+  return and_(func.earth_box(center, meters).op('@>')(earth_location(model)),
+    func.earth_distance(center, earth_location(model)) <= meters)
+
+def near_filter(model, args):
+  # The radius condition asked for by near (or lat and lng) and within, and
+  # what the page should say about it: None when no location was given,
+  # otherwise {"near", "miles", "origin"} with origin None for an unknown place.
+  if not args.get('near') and args.get('lat') is None:
+    return [], None
+  origin = request_origin(args)
+  miles = request_miles(args)
+  location = {"near": args.get('near') or f"{args.get('lat')}, {args.get('lng')}", "miles": miles, "origin": origin}
+  if origin is None:
+    # An unknown place matches nothing rather than everything.
+    return [false()], location
+  return [within_radius(model, origin, miles)], location
+
+def nearest_statement(model, origin, limit, miles=None):
+  # The limit rows closest to origin, nearest first, optionally only those
+  # within miles. Ordering by cube's <-> distance to the indexed expression
+  # is a nearest-neighbour scan of the GiST index, and straight-line distance
+  # through the earth orders places the same as distance along its surface.
+  center = func.ll_to_earth(*origin)
+  distance = func.earth_distance(center, earth_location(model)) / METERS_PER_MILE
+  statement = select(model.id, model.name, model.city, model.state, distance.label('distance_miles'))\
+    .where(model.latitude.isnot(None))
+  if miles is not None:
+    statement = statement.where(within_radius(model, origin, miles))
+  return statement.order_by(earth_location(model).op('<->')(center)).limit(limit)
+
+def shape_nearest(rows):
+  return [{
+    "id": row.id,
+    "name": row.name,
+    "city": row.city,
+    "state": row.state,
+    "distance_miles": round(row.distance_miles, 1)
+  } for row in rows]
+
+def nearest(model, origin, limit, miles=None):
+  return shape_nearest(db.session.execute(nearest_statement(model, origin, limit, miles)).all())
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
 
-app.jinja_env.filters['datetime'] = format_datetime
+# Each app's cache is created by create_app.
+response_cache = LocalProxy(lambda: current_app.extensions['response_cache'])
+
+def add_cache_tags(*tags):
+  # Record the rows the current response depends on, e.g. 'venue:3', or a
+  # collection tag ('venues', 'artists', 'shows') for inserts and deletes.
+  if 'cache_tags' in g:
+    g.cache_tags.update(tags)
+
+def cached_response(view):
+  # Cache rendered GET responses keyed by route and arguments. A response is
+  # stored only if the handler tagged it, so pages rendered after a swallowed
+  # database error are never cached. Requests with pending flash messages
+  # bypass the cache since the layout renders them into the page.
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    if not current_app.config['RESPONSE_CACHE_ENABLED'] or session.get('_flashes'):
+      return view(*args, **kwargs)
+
+    key = (request.endpoint, tuple(sorted(kwargs.items())), tuple(sorted(request.args.items(multi=True))))
+    entry = response_cache.get(key)
+    if entry is not None:
+      body, mimetype, headers = entry
+      # Cached pages keep their ETag/Last-Modified, so hits can still be 304s.
+      return Response(body, mimetype=mimetype, headers=headers).make_conditional(request)
+
+    g.cache_tags = set()
+    response = make_response(view(*args, **kwargs))
+    # A replica read shortly after a write here may predate that write, and
+    # caching it would outlive the write's invalidation.
+    stale = g.get('db_role') == 'replica' and replica_router.recently_written()
+    if response.status_code == 200 and g.cache_tags and not response.is_streamed and not stale:
+      body = response.get_data()
+      headers = [(name, value) for name, value in response.headers if name in ('ETag', 'Last-Modified')]
+      response_cache.set(key, (body, response.mimetype, headers), len(body), g.cache_tags)
+    return response
+  return wrapper
+
+@route('/cache/stats')
+def cache_stats():
+  return jsonify(response_cache.stats())
+
+@route('/pool/stats')
+def database_pool_stats():
+  # Stats for the worker that served this request; sample repeatedly to see all workers.
+  return jsonify(pool_stats(db.engine))
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@route('/')
 def index():
   return render_template('pages/home.html')
 
@@ -123,40 +928,22 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@route('/venues')
+@cached_response
 def venues():
-  # Get current time to use for past and upcoming shows query.
-  current_time = datetime.now()
-  
   dbData = []
+  page = {"next": None, "prev": None}
+  closest = []
+  # ?near=Austin, TX&within=10 lists only venues within 10 miles of Austin,
+  # with the closest few first.
+  conditions, location = near_filter(Venue, request.args)
   try:
-    # Get distinct combinations of state and city in alphabetical order.
-    cityStateGroup = Venue.query.with_entities(Venue.id, Venue.city, Venue.state)\
-      .distinct(Venue.city, Venue.state).order_by(Venue.state, Venue.city).all()
-
-    # For each distinct city/group combination get venues.
-    for area in cityStateGroup:
-      venues = []
-      areaVenues = Venue.query.filter_by(state=area.state).filter_by(city=area.city).all()
-      for venue in areaVenues:
-        # Get number of upcoming shows.
-        num_upcoming_shows = Show.query.with_entities(func.count(Show.venue_id))\
-          .filter_by(venue_id=area.id).filter(Show.start_time>current_time).first()
-
-        venueData = {
-          "id": venue.id,
-          "name": venue.name,
-          "num_upcoming_shows": num_upcoming_shows[0]
-        }
-        venues.append(venueData)
-
-      areaVenue = {
-        "city": area.city,
-        "state": area.state,
-        "venues": venues
-      }
-      dbData.append(areaVenue)
-    
+    # Areas, venues and upcoming show counts for this page all come from a single query.
+    dbData, page = venue_areas(request.args.get('after'), request.args.get('before'), conditions)
+    if location and location['origin']:
+      closest = nearest(Venue, location['origin'], current_app.config['NEAREST_DEFAULT_LIMIT'], location['miles'])
+    add_cache_tags('venues', *[f"venue:{venue['id']}" for area in dbData for venue in area['venues']])
+
   except:
     db.session.rollback()
     print(sys.exc_info())
@@ -164,40 +951,22 @@ def venues():
     db.session.close()
 
   # Pass data from database to render the template for venues.
-  return render_template('pages/venues.html', areas=dbData);
+  return render_template('pages/venues.html', areas=dbData, page=page, location=location, nearest=closest);
 
-@app.route('/venues/search', methods=['POST'])
+@route('/venues/search', methods=['POST'])
 def search_venues():
   # Search artists with partial string search. Ensure it is case-insensitive.
   try:
-    # Get current time to use in past and upcoming shows query.
-    current_time = datetime.now()
     search_term = request.form.get('search_term','')
 
-    # Select venues matching the given search term in case-insensitive search.
-    venues = Venue.query.filter(Venue.name.ilike('%' + search_term + '%')).all()
+    # Select venues matching the given search term, ranked by similarity,
+    # with upcoming show counts for all of them from one query. A near field
+    # limits the matches to venues around that place.
+    conditions = near_filter(Venue, request.form)[0]
+    response = search_results(Venue, venue_upcoming_shows, search_term, conditions)
     error = False
-    response = {}
-
-    if venues:
-      data = []
-      for venue in venues:
-        # Get number of upcoming shows by filtering shows for the venue id by start time.
-        num_upcoming_shows = len(Show.query.filter_by(venue_id=venue.id)\
-          .filter(Show.start_time>current_time).all())
-        
-        data.append({
-          "id": venue.id,
-          "name": venue.name,
-          "num_upcoming_shows": num_upcoming_shows  
-        })
-      
-      response = {
-        "count": len(venues),
-        "data": data
-      }
 
-    else:
+    if not response:
       error = True
   except:
     error = True
@@ -213,73 +982,63 @@ def search_venues():
   else:
     return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/venues/<int:venue_id>')
+@route('/venues/browse')
+@cached_response
+def browse_venues():
+  venues, facets, page = [], None, {"next": None, "prev": None}
+  try:
+    venues, facets, page = browse(Venue, Venue.seeking_talent, venue_facets, VENUE_NAME_KEYS, request.args)
+    add_cache_tags('venues')
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+  return render_template('pages/browse.html', title='Venues', path='/venues', seeking_label='Seeking talent',
+    items=venues, facets=facets, page=page)
+
+@route('/venues/availability')
+@cached_response
+def venue_availability():
+  # Which venues are free for a whole time window, e.g. Austin venues that
+  # take rock next Friday night.
+  from forms import AvailabilityForm
+  form = AvailabilityForm(request.args)
+  results = None
+  if request.args and form.validate():
+    try:
+      results = available_venues(form.city.data, form.state.data, form.genres.data, form.start.data, form.end.data)
+      add_cache_tags('venues', 'shows')
+    except:
+      db.session.rollback()
+      print(sys.exc_info())
+      flash('Could not search venue availability.')
+    finally:
+      db.session.close()
+  return render_template('pages/venue_availability.html', form=form, results=results)
+
+@route('/venues/<int:venue_id>')
+@cached_response
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
 
   # Get current time to use in past and upcoming shows queries.
   current_time = datetime.now()
   error = False
+  notModified = False
   dbData = {}
 
   try:
-    venue = Venue.query.filter_by(id=venue_id).first()
+    # The venue row comes back with its ETag and Last-Modified, so conditional
+    # requests are answered before the schedule is queried or rendered.
+    venue, etag, last_modified = entity_validators(Venue, Show.venue_id, venue_id, current_time)
     if venue is None:
       error = True
+    elif request_not_modified(etag, last_modified):
+      notModified = True
     else: 
-      past_shows = []
-      upcoming_shows = []
-      past_shows_count = 0 
-      upcoming_shows_count = 0
-
-      # Collecting past shows
-      pastShows = Show.query.join(Artist).with_entities(Artist.id, Artist.name, Artist.image_link, Show.start_time)\
-        .filter(Show.venue_id==venue.id).filter(Show.start_time<current_time).all()
-      
-      if pastShows:
-        past_shows_count = len(pastShows)
-        for show in pastShows:
-          pastShowObj = {
-            "artist_id": show.id,
-            "artist_name": show.name,
-            "artist_image_link": show.image_link,
-            "start_time": format_datetime(str(show.start_time))
-          }
-          past_shows.append(pastShowObj)
-
-      # Collecting upcoming shows
-      upcomingShows = Show.query.join(Artist).with_entities(Artist.id, Artist.name, Artist.image_link, Show.start_time)\
-        .filter(Show.venue_id==venue.id).filter(Show.start_time>current_time).all()
-      if upcomingShows:
-        upcoming_shows_count = len(upcomingShows)
-        for show in upcomingShows:
-          upcomingShowObj = {
-            "artist_id": show.id,
-            "artist_name": show.name,
-            "artist_image_link": show.image_link,
-            "start_time": format_datetime(str(show.start_time))
-          }
-          upcoming_shows.append(upcomingShowObj)
-
-      # Put together all the data into dbData
-      dbData = {
-        "id": venue.id,
-        "name": venue.name,
-        "genres": venue.genres,
-        "address": venue.address,
-        "city": venue.city,
-        "state": venue.state,
-        "phone": venue.phone,
-        "website": venue.website,
-        "facebook_link": venue.facebook_link,
-        "seeking_talent": venue.seeking_talent,
-        "seeking_description": venue.seeking_description,
-        "image_link": venue.image_link,
-        "past_shows": past_shows,
-        "upcoming_shows": upcoming_shows,
-        "past_shows_count": past_shows_count,
-        "upcoming_shows_count": upcoming_shows_count
-      }
+      dbData = venue_detail(venue, current_time)
+      add_cache_tags(f'venue:{venue.id}', *[f"artist:{show['artist_id']}" for show in dbData['past_shows'] + dbData['upcoming_shows']])
 
   except:
     error = True
@@ -291,24 +1050,28 @@ def show_venue(venue_id):
   # If error is true then throw 404 error so that not_found_error() gets called.
   if error:
     abort(404)
+  elif notModified:
+    return with_validators(Response(status=304), etag, last_modified)
   else:
-    return render_template('pages/show_venue.html', venue=dbData)
+    return with_validators(render_template('pages/show_venue.html', venue=dbData), etag, last_modified)
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@route('/venues/create', methods=['GET'])
 def create_venue_form():
+  from forms import VenueForm
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
+@route('/venues/create', methods=['POST'])
 def create_venue_submission():
   error = False
   data = {}
   venue_name = request.form['name']
 
   try:
+    from forms import VenueForm
     form = VenueForm(request.form)
     validateForm = form.validate_on_submit()
     if not validateForm:
@@ -337,9 +1100,12 @@ def create_venue_submission():
       genres=genres, website=website, image_link=image_link, facebook_link=facebook_link, \
       seeking_talent=seeking_talent, seeking_description=seeking_description)
 
+    venue.locate()
+
     # Insert into db and commit.
     db.session.add(venue)
     db.session.commit()
+    response_cache.invalidate('venues')
 
     # modify data to be the data object returned from db insertion
     data['venue_id'] = venue.id
@@ -360,15 +1126,17 @@ def create_venue_submission():
 
   return render_template('pages/home.html')
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
   # Complete this endpoint for taking a venue_id, and using
   # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
   error = False
   try:
     venue = Venue.query.filter_by(id=venue_id).first()
+    artistIds = db.session.execute(delete(Show).where(Show.venue_id==venue.id).returning(Show.artist_id)).scalars().all()
     db.session.delete(venue)
     db.session.commit()
+    response_cache.invalidate('venues', 'shows', f'venue:{venue_id}', *[f'artist:{artistId}' for artistId in set(artistIds)])
   except:
     error = True
     print(sys.exc_info())
@@ -384,55 +1152,48 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@route('/artists')
+@cached_response
 def artists():
   # Replace with real data returned from querying the database
   dbData = []
+  page = {"next": None, "prev": None}
 
   try:
-    artists = Artist.query.all()
-    if artists:
-      for artist in artists:
-        artistObj = {
-          "id": artist.id,
-          "name": artist.name
-        }
-        dbData.append(artistObj)
+    dbData, page = artist_list(request.args.get('after'), request.args.get('before'))
+    add_cache_tags('artists', *[f"artist:{artist['id']}" for artist in dbData])
   except:
     db.session.rollback()
     print(sys.exc_info())
   finally:
     db.session.close()
 
-  return render_template('pages/artists.html', artists=dbData)
+  return render_template('pages/artists.html', artists=dbData, page=page)
 
-@app.route('/artists/search', methods=['POST'])
+@route('/artists/browse')
+@cached_response
+def browse_artists():
+  artists, facets, page = [], None, {"next": None, "prev": None}
+  try:
+    artists, facets, page = browse(Artist, Artist.seeking_venue, artist_facets, ARTIST_LIST_KEYS, request.args)
+    add_cache_tags('artists')
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+  return render_template('pages/browse.html', title='Artists', path='/artists', seeking_label='Seeking venues',
+    items=artists, facets=facets, page=page)
+
+@route('/artists/search', methods=['POST'])
 def search_artists():
   # Implement search on artists with partial string search. Ensure it is case-insensitive.
   try:
-    # Getting current time to use in upcoming shows query.
-    current_time = datetime.now()
     search_term = request.form.get('search_term','')
-    artists = Artist.query.filter(Artist.name.ilike('%' + search_term + '%')).all()
+    response = search_results(Artist, artist_upcoming_shows, search_term)
     error = False
 
-    response = {}
-    if artists:
-      data = []
-      for artist in artists:
-        num_upcoming_shows = len(Show.query.filter_by(artist_id=artist.id).filter(Show.start_time>current_time).all())
-
-        data.append({
-          "id": artist.id,
-          "name": artist.name,
-          "num_upcoming_shows": num_upcoming_shows
-        })
-      response = {
-        "count": len(artists),
-        "data": data
-      }
-
-    else:
+    if not response:
       error = True
   except:
     error = True
@@ -447,73 +1208,28 @@ def search_artists():
   else:
     return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/artists/<int:artist_id>')
+@route('/artists/<int:artist_id>')
+@cached_response
 def show_artist(artist_id):
   # shows the venue page with the given venue_id
   # Replace with real venue data from the venues table, using venue_id
   current_time = datetime.now()
   error = False
+  notModified = False
 
   dbData = {}
   try:
-    artist = Artist.query.filter_by(id=artist_id).first()
+    artist, etag, last_modified = entity_validators(Artist, Show.artist_id, artist_id, current_time)
     if artist is None:
       error = True
+    elif request_not_modified(etag, last_modified):
+      notModified = True
     else:
-      past_shows = []
-      past_shows_count = 0
-      upcoming_shows = []
-      upcoming_shows_count = 0
-
-      # Collecting past shows
-      pastShows = Show.query.join(Venue).with_entities(Venue.id, Venue.name, Venue.image_link, Show.start_time)\
-        .filter(Show.artist_id==artist_id).filter(Show.start_time<current_time).all()
-
-      if pastShows:
-        past_shows_count = len(pastShows)
-        for show in pastShows:
-          pastShowObj = {
-            "venue_id": show.id,
-            "venue_name": show.name,
-            "venue_image_link": show.image_link,
-            "start_time": format_datetime(str(show.start_time))
-          }
-          past_shows.append(pastShowObj)
-
-      # Collecting upcoming shows
-      upcomingShows = Show.query.join(Venue).with_entities(Venue.id, Venue.name, Venue.image_link, Show.start_time)\
-        .filter(Show.artist_id==artist_id).filter(Show.start_time>current_time).all()
-
-      if upcomingShows:
-        upcoming_shows_count = len(upcomingShows)
-        for show in upcomingShows:
-          upcomingShowObj = {
-            "venue_id": show.id,
-            "venue_name": show.name,
-            "venue_image_link": show.image_link,
-            "start_time": format_datetime(str(show.start_time))
-          }
-          upcoming_shows.append(upcomingShowObj)
-
-      dbData = {
-        "id": artist.id,
-        "name": artist.name,
-        "genres": artist.genres,
-        "city": artist.city,
-        "state": artist.state,
-        "phone": artist.phone,
-        "website": artist.website,
-        "facebook_link": artist.facebook_link,
-        "seeking_venue": artist.seeking_venue,
-        "seeking_description": artist.seeking_description,
-        "image_link": artist.image_link,
-        "past_shows": past_shows,
-        "upcoming_shows": upcoming_shows,
-        "past_shows_count": past_shows_count,
-        "upcoming_shows_count": upcoming_shows_count
-      }
+      dbData = artist_detail(artist, current_time)
+      add_cache_tags(f'artist:{artist.id}', *[f"venue:{show['venue_id']}" for show in dbData['past_shows'] + dbData['upcoming_shows']])
 
   except:
+    error = True
     db.session.rollback()
     print(sys.exc_info())
   finally:
@@ -521,14 +1237,17 @@ def show_artist(artist_id):
 
   if error:
     abort(404)
+  elif notModified:
+    return with_validators(Response(status=304), etag, last_modified)
   else:
-    return render_template('pages/show_artist.html', artist=dbData)
+    return with_validators(render_template('pages/show_artist.html', artist=dbData), etag, last_modified)
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   error = False
+  from forms import ArtistForm
   form = ArtistForm()
   try:
     artist = Artist.query.filter_by(id=artist_id).first()
@@ -555,7 +1274,7 @@ def edit_artist(artist_id):
     # Populate form with fields from artist with ID <artist_id>
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
   # Take values from the form submitted, and update existing
   # artist record with ID <artist_id> using the new attributes
@@ -563,6 +1282,7 @@ def edit_artist_submission(artist_id):
   try:
     artist = Artist.query.filter_by(id=artist_id).first()
     if artist:
+      from forms import ArtistForm
       form = ArtistForm(request.form)
       validateForm = form.validate_on_submit()
       if not validateForm:
@@ -591,8 +1311,10 @@ def edit_artist_submission(artist_id):
       artist.website = website
       artist.seeking_venue = seeking_venue
       artist.seeking_description = seeking_description
+      artist.locate()
 
       db.session.commit()
+      response_cache.invalidate('artists', f'artist:{artist_id}')
     else:
       error = True
   except:
@@ -606,8 +1328,9 @@ def edit_artist_submission(artist_id):
     flash('Could not update artist Id: ' + str(artist_id))
   return redirect(url_for('show_artist', artist_id=artist_id))
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
+  from forms import VenueForm
   form = VenueForm()
   error = False
   try:
@@ -633,7 +1356,7 @@ def edit_venue(venue_id):
     # Populate form with values from venue with ID <venue_id>
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
   # Take values from the form submitted, and update existing
   # venue record with ID <venue_id> using the new attributes
@@ -642,6 +1365,7 @@ def edit_venue_submission(venue_id):
 
   if venue:
     try:
+      from forms import VenueForm
       form = VenueForm(request.form)
       validateForm = form.validate_on_submit()
       if not validateForm:
@@ -674,8 +1398,10 @@ def edit_venue_submission(venue_id):
       venue.facebook_link = facebook_link
       venue.seeking_talent = seeking_talent
       venue.seeking_description = seeking_description
+      venue.locate()
 
       db.session.commit()
+      response_cache.invalidate('venues', f'venue:{venue_id}')
       
     except:
       db.session.rollback()
@@ -696,17 +1422,19 @@ def edit_venue_submission(venue_id):
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@route('/artists/create', methods=['GET'])
 def create_artist_form():
+  from forms import ArtistForm
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@route('/artists/create', methods=['POST'])
 def create_artist_submission():
   # called upon submitting the new artist listing form
   error = False
   data = {}
   try:
+    from forms import ArtistForm
     form = ArtistForm(request.form)
     validateForm = form.validate_on_submit()
     if not validateForm:
@@ -728,11 +1456,13 @@ def create_artist_submission():
     artist = Artist(name=name, city=city, state=state, phone=phone, genres=genres, \
       image_link=image_link, facebook_link=facebook_link, website=website, \
         seeking_venue=seeking_venue, seeking_description=seeking_description)
+    artist.locate()
 
     data['name'] = name
 
     db.session.add(artist)
     db.session.commit()
+    response_cache.invalidate('artists')
     data['artist_id'] = artist.id
 
     # Modify data to be the data object returned from db insertion
@@ -757,45 +1487,46 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@route('/shows')
+@cached_response
 def shows():
   # displays list of shows at /shows
   # Replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
+  page = {"next": None, "prev": None}
+
+  # In streaming mode tiles are rendered as rows arrive from the cursor and the
+  # whole history is sent without pagination. Streamed pages are not cached.
+  if current_app.config['SHOWS_STREAMING']:
+    return stream_template('pages/shows.html', shows=stream_shows(), page=page)
+
   dbData = []
 
   try:
-    shows = Show.query.join(Venue).join(Artist).with_entities(Show.venue_id, Venue.name.label('venue_name'), Show.artist_id, Artist.name, Artist.image_link, Show.start_time).all()
-
-    for show in shows:
-      showObj = {
-        "venue_id": show.venue_id,
-        "venue_name": show.venue_name,
-        "artist_id": show.artist_id,
-        "artist_name": show.name,
-        "artist_image_link": show.image_link,
-        "start_time": format_datetime(str(show.start_time))
-      }
-      dbData.append(showObj)
+    dbData, page = show_list(request.args.get('after'), request.args.get('before'))
+    add_cache_tags('shows', *[f"venue:{show['venue_id']}" for show in dbData], *[f"artist:{show['artist_id']}" for show in dbData])
   except:
     db.session.rollback()
     print(sys.exc_info())
   finally:
     db.session.close()
 
-  return render_template('pages/shows.html', shows=dbData)
+  return render_template('pages/shows.html', shows=dbData, page=page)
 
-@app.route('/shows/create')
+@route('/shows/create')
 def create_shows():
   # renders form. do not touch.
+  from forms import ShowForm
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+@route('/shows/create', methods=['POST'])
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
   error = False
+  message = 'An error occurred. Show could not be listed.'
   try:
+    from forms import ShowForm
     form = ShowForm(request.form)
     validateForm = form.validate_on_submit()
     if not validateForm:
@@ -805,12 +1536,18 @@ def create_show_submission():
     artist_id = request.form.get('artist_id')
     venue_id = request.form.get('venue_id')
     start_time = request.form.get('start_time')
+    duration = timedelta(minutes=form.duration.data)
 
-    show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
+    show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time, duration=duration)
  
     # Insert form data as a new Show record in the db
     db.session.add(show)
     db.session.commit()
+    response_cache.invalidate('shows', f'venue:{venue_id}', f'artist:{artist_id}')
+  except IntegrityError as integrityError:
+    error = True
+    message = show_conflict(integrityError)[0]
+    db.session.rollback()
   except:
     error = True
     db.session.rollback()
@@ -820,43 +1557,391 @@ def create_show_submission():
 
   if error:
     # On unsuccessful db insert, flash an error instead.
-    flash('An error occurred. Show could not be listed.')
+    flash(message)
   else:
     # on successful db insert, flash success
     flash('Show was successfully listed!')
 
   return render_template('pages/home.html')
 
-@app.errorhandler(404)
+def show_conflict(error):
+  # A message and HTTP status for an IntegrityError raised inserting shows.
+  code = getattr(error.orig, 'pgcode', None)
+  if code == '23P01':
+    return 'The venue already has a show at that time.', 409
+  if code == '23505':
+    return 'The artist already plays that venue at that time.', 409
+  if code == '23503':
+    return 'Unknown artist or venue.', 422
+  return 'Show could not be listed.', 422
+
+def bulk_show_row(item):
+  # One show of a bulk request as insert values, or None and the reason it
+  # was rejected.
+  if not isinstance(item, dict):
+    return None, 'not an object'
+  row = {}
+  for key in ('artist_id', 'venue_id'):
+    if isinstance(item.get(key), bool) or not isinstance(item.get(key), int):
+      return None, f'{key} must be an integer'
+    row[key] = item[key]
+  try:
+    row['start_time'] = datetime.fromisoformat(item.get('start_time'))
+  except (TypeError, ValueError):
+    return None, 'start_time must be an ISO 8601 timestamp'
+  if row['start_time'].tzinfo is not None:
+    return None, 'start_time must be a local time without a UTC offset'
+  minutes = item.get('duration_minutes', SHOW_DEFAULT_DURATION // timedelta(minutes=1))
+  if isinstance(minutes, bool) or not isinstance(minutes, int) or not 0 < minutes <= 24 * 60:
+    return None, 'duration_minutes must be a whole number of minutes from 1 to 1440'
+  row['duration'] = timedelta(minutes=minutes)
+  return row, None
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+# Mirrors the HTML routes using the same query functions, so the payloads have
+# the same shape as the dicts the templates receive.
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+def dumps_json(value):
+  # orjson encodes datetimes natively as ISO 8601; the stdlib fallback matches.
+  if orjson is not None:
+    return orjson.dumps(value)
+  return json.dumps(value, default=lambda obj: obj.isoformat()).encode('utf-8')
+
+def json_response(value, status=200):
+  return Response(dumps_json(value), status=status, mimetype='application/json')
+
+def json_list_body(items, **meta):
+  # {"data": [...], **meta} one item at a time, so a large list is never
+  # encoded into a single body.
+  yield b'{"data":['
+  for index, item in enumerate(items):
+    if index:
+      yield b','
+    yield dumps_json(item)
+  yield b']'
+  for name, value in meta.items():
+    yield b',' + dumps_json(name) + b':' + dumps_json(value)
+  yield b'}'
+
+def json_list_response(items, **meta):
+  return Response(json_list_body(items, **meta), mimetype='application/json')
+
+def json_error(message, status):
+  return json_response({"error": message}, status)
+
+@api.route('/venues')
+def list_venues():
+  try:
+    conditions = near_filter(Venue, request.args)[0]
+    areas, page = venue_areas(request.args.get('after'), request.args.get('before'), conditions)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error('Could not list venues.', 500)
+  finally:
+    db.session.close()
+  return json_list_response(areas, next=page['next'], prev=page['prev'])
+
+@api.route('/venues/search')
+def find_venues():
+  try:
+    conditions = near_filter(Venue, request.args)[0]
+    response = search_results(Venue, venue_upcoming_shows, request.args.get('search_term', ''), conditions)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error('Could not search venues.', 500)
+  finally:
+    db.session.close()
+  return json_response(response or {"count": 0, "data": []})
+
+@api.route('/venues/browse')
+def browse_venues_api():
+  try:
+    venues, facets, page = browse(Venue, Venue.seeking_talent, venue_facets, VENUE_NAME_KEYS, request.args)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error('Could not browse venues.', 500)
+  finally:
+    db.session.close()
+  return json_response({"data": venues, "facets": facets, "next": page['next'], "prev": page['prev']})
+
+@api.route('/venues/availability')
+def find_available_venues():
+  from forms import AvailabilityForm
+  form = AvailabilityForm(request.args)
+  if not form.validate():
+    return json_response({"error": 'Invalid availability search.', "details": form.errors}, 422)
+  try:
+    venues = available_venues(form.city.data, form.state.data, form.genres.data, form.start.data, form.end.data)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error('Could not search venue availability.', 500)
+  finally:
+    db.session.close()
+  return json_response({"count": len(venues), "data": venues})
+
+def find_nearest(model, label):
+  # The nearest rows to near (or lat and lng), or with within only those in
+  # that radius, closest first with their distance in miles.
+  origin = request_origin(request.args)
+  if origin is None:
+    return json_error('Give lat and lng, or near as "City, ST" or a ZIP code the gazetteer knows.', 422)
+  limit = request.args.get('limit', current_app.config['NEAREST_DEFAULT_LIMIT'], type=int)
+  limit = max(1, min(limit, current_app.config['NEAREST_MAX_LIMIT']))
+  miles = request_miles(request.args) if 'within' in request.args else None
+  try:
+    rows = nearest(model, origin, limit, miles)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error(f'Could not find nearby {label}.', 500)
+  finally:
+    db.session.close()
+  return json_response({"count": len(rows), "origin": {"lat": origin[0], "lng": origin[1]}, "data": rows})
+
+@api.route('/venues/near')
+def find_nearest_venues():
+  return find_nearest(Venue, 'venues')
+
+@api.route('/venues/<int:venue_id>')
+def get_venue(venue_id):
+  current_time = datetime.now()
+  try:
+    venue, etag, last_modified = entity_validators(Venue, Show.venue_id, venue_id, current_time)
+    if venue is None:
+      return json_error('Venue not found.', 404)
+    if request_not_modified(etag, last_modified):
+      return with_validators(Response(status=304), etag, last_modified)
+    dbData = venue_detail(venue, current_time)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error('Could not load venue.', 500)
+  finally:
+    db.session.close()
+  return with_validators(json_response(dbData), etag, last_modified)
+
+@api.route('/artists')
+def list_artists():
+  try:
+    artists, page = artist_list(request.args.get('after'), request.args.get('before'))
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error('Could not list artists.', 500)
+  finally:
+    db.session.close()
+  return json_list_response(artists, next=page['next'], prev=page['prev'])
+
+@api.route('/artists/search')
+def find_artists():
+  try:
+    response = search_results(Artist, artist_upcoming_shows, request.args.get('search_term', ''))
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error('Could not search artists.', 500)
+  finally:
+    db.session.close()
+  return json_response(response or {"count": 0, "data": []})
+
+@api.route('/artists/browse')
+def browse_artists_api():
+  try:
+    artists, facets, page = browse(Artist, Artist.seeking_venue, artist_facets, ARTIST_LIST_KEYS, request.args)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error('Could not browse artists.', 500)
+  finally:
+    db.session.close()
+  return json_response({"data": artists, "facets": facets, "next": page['next'], "prev": page['prev']})
+
+@api.route('/artists/near')
+def find_nearest_artists():
+  return find_nearest(Artist, 'artists')
+
+@api.route('/artists/<int:artist_id>')
+def get_artist(artist_id):
+  current_time = datetime.now()
+  try:
+    artist, etag, last_modified = entity_validators(Artist, Show.artist_id, artist_id, current_time)
+    if artist is None:
+      return json_error('Artist not found.', 404)
+    if request_not_modified(etag, last_modified):
+      return with_validators(Response(status=304), etag, last_modified)
+    dbData = artist_detail(artist, current_time)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error('Could not load artist.', 500)
+  finally:
+    db.session.close()
+  return with_validators(json_response(dbData), etag, last_modified)
+
+@api.route('/shows')
+def list_shows():
+  try:
+    shows, page = show_list(request.args.get('after'), request.args.get('before'))
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error('Could not list shows.', 500)
+  finally:
+    db.session.close()
+  return json_list_response(shows, next=page['next'], prev=page['prev'])
+
+@api.route('/shows', methods=['POST'])
+def schedule_shows():
+  # A whole tour or season as {"shows": [{"artist_id", "venue_id",
+  # "start_time", "duration_minutes"}, ...]}, inserted all or nothing with one
+  # multi-row INSERT. Overlaps with existing shows or within the batch are
+  # left to the database's exclusion constraints.
+  payload = request.get_json(silent=True)
+  items = payload.get('shows') if isinstance(payload, dict) else None
+  if not isinstance(items, list) or not items:
+    return json_error('Expected a JSON object with a non-empty "shows" list.', 400)
+  if len(items) > current_app.config['SHOW_BULK_MAX']:
+    return json_error(f"At most {current_app.config['SHOW_BULK_MAX']} shows per request.", 413)
+
+  rows, problems = [], []
+  updated_at = datetime.utcnow()
+  for index, item in enumerate(items):
+    row, problem = bulk_show_row(item)
+    if problem is not None:
+      problems.append({"index": index, "error": problem})
+    else:
+      rows.append(dict(row, updated_at=updated_at, version=1))
+  if problems:
+    return json_response({"error": 'Some shows are invalid; none were scheduled.', "details": problems}, 422)
+
+  try:
+    db.session.execute(insert(Show).values(rows))
+    db.session.commit()
+  except IntegrityError as error:
+    db.session.rollback()
+    message, status = show_conflict(error)
+    # Postgres names the conflicting rows, e.g. both shows' time ranges.
+    detail = getattr(getattr(error.orig, 'diag', None), 'message_detail', None)
+    return json_response({"error": message, "detail": detail}, status)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return json_error('Could not schedule shows.', 500)
+  finally:
+    db.session.close()
+
+  tags = {f"venue:{row['venue_id']}" for row in rows} | {f"artist:{row['artist_id']}" for row in rows}
+  response_cache.invalidate('shows', *tags)
+  return json_response({"count": len(rows)}, 201)
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.command('import')
+@with_appcontext
+@click.option('--venues', 'venue_paths', multiple=True, type=click.Path(exists=True, dir_okay=False),
+  help='CSV or NDJSON file of venues. May be repeated.')
+@click.option('--artists', 'artist_paths', multiple=True, type=click.Path(exists=True, dir_okay=False),
+  help='CSV or NDJSON file of artists. May be repeated.')
+@click.option('--shows', 'show_paths', multiple=True, type=click.Path(exists=True, dir_okay=False),
+  help='CSV or NDJSON file of shows, naming their artist and venue. May be repeated.')
+@click.option('--update-existing', is_flag=True,
+  help='Overwrite venues, artists and shows that already exist instead of skipping them.')
+def import_catalog(venue_paths, artist_paths, show_paths, update_existing):
+  """Bulk load venues, artists and shows with COPY."""
+  # Venues and artists go first so shows in the same run can refer to them.
+  connection = db.engine.raw_connection()
+  failed = False
+  try:
+    for entity, paths in (('venue', venue_paths), ('artist', artist_paths), ('show', show_paths)):
+      for path in paths:
+        report = import_file(connection, entity, path, update_existing)
+        failed = failed or bool(report['failed'])
+        click.echo(format_report(report))
+  finally:
+    connection.close()
+  if show_paths:
+    # Past shows land in show_default; give their months partitions now.
+    created = create_show_partitions(db.engine, current_app.config['SHOW_PARTITIONS_AHEAD'])
+    click.echo(f'Created {created} show partitions.')
+  if failed:
+    raise SystemExit(1)
+
+@click.command('refresh-counts')
+@with_appcontext
+def refresh_counts():
+  """Refresh the materialized upcoming show counts now."""
+  refresh_upcoming_counts(db.engine)
+  click.echo('Refreshed upcoming show counts.')
+
+@click.command('partitions')
+@with_appcontext
+@click.option('--months-ahead', type=int, default=None,
+  help='Create monthly show partitions this far ahead (default SHOW_PARTITIONS_AHEAD).')
+@click.option('--from-month', type=click.DateTime(formats=['%Y-%m']), default=None,
+  help='Create partitions from this month (YYYY-MM) on; shows in show_default always get theirs.')
+@click.option('--detach-older-than', type=int, default=None,
+  help='Detach show partitions that ended at least this many months ago.')
+@click.option('--drop', is_flag=True, help='Drop detached partitions instead of keeping them for archiving.')
+def maintain_partitions(months_ahead, from_month, detach_older_than, drop):
+  """Create missing show partitions and detach old ones."""
+  if months_ahead is None:
+    months_ahead = current_app.config['SHOW_PARTITIONS_AHEAD']
+  created = create_show_partitions(db.engine, months_ahead, from_month.date() if from_month else None)
+  click.echo(f'Created {created} show partitions.')
+  if detach_older_than is not None:
+    for name in detach_show_partitions(db.engine, detach_older_than, drop):
+      click.echo(f"{'Dropped' if drop else 'Detached'} {name}.")
+
+@click.command('geocode')
+@with_appcontext
+@click.option('--all', 'everything', is_flag=True, help='Place every venue and artist again, not only those without coordinates.')
+def geocode_catalog(everything):
+  """Set venue and artist coordinates from the gazetteer files."""
+  if not geocoder.paths:
+    raise click.UsageError('Set GAZETTEER_PATH and/or GAZETTEER_ZIP_PATH first.')
+  for table in ('venue', 'artist'):
+    located, unmatched = geocode_table(db.engine, table, geocoder.gazetteer, everything)
+    click.echo(f'Placed {located} {table} rows; {sum(unmatched.values())} not found.')
+    # The most common misses first: usually misspelt cities.
+    for (city, state), count in sorted(unmatched.items(), key=lambda item: -item[1])[:10]:
+      click.echo(f'  {city}, {state}: {count}')
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets():
+  """Bundle, fingerprint and pre-compress static assets into static/dist."""
+  manifest = build_asset_files(current_app.static_folder)
+  for name, output in sorted(manifest.items()):
+    click.echo(f'{name} -> {output}')
+
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,364 @@
+import asyncio
+from datetime import datetime
+
+from asgiref.wsgi import WsgiToAsgi
+from quart import Blueprint, Quart, Response, abort, g, render_template, request, url_for
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from werkzeug.exceptions import HTTPException
+
+import app as fyyur
+from app import Artist, Show, Venue
+from counters import artist_upcoming_shows, venue_upcoming_shows
+from dbpool import async_engine_options
+
+
+# Async serving mode.
+#
+#   hypercorn asgi:application --workers 2
+#
+# The read-only pages and JSON API routes are served by async Quart handlers
+# on an asyncpg engine. Independent queries, such as a venue row and its
+# schedule, run concurrently on separate connections, and a request waiting on
+# the database holds no thread, so one process can keep thousands of requests
+# in flight. Every other route (forms, writes, static files) falls through to
+# the Flask app unchanged, run in a thread pool. Both share templates, query
+# builders and page shaping with app.py. The async handlers still answer
+# conditional requests with 304, but bypass three Flask hooks: the response
+# cache, read replica routing (they always read the primary through
+# DATABASE_URL) and per-request SQL stats (no X-DB-Stats header or slow query
+# log entries).
+
+flask_app = fyyur.create_app()
+
+quart = Quart(__name__, static_folder=None)
+quart.config['SECRET_KEY'] = flask_app.config['SECRET_KEY']
+quart.jinja_env.filters['datetime'] = flask_app.jinja_env.filters['datetime']
+quart.jinja_env.globals.update(asset_url=flask_app.jinja_env.globals['asset_url'],
+    asset_urls=flask_app.jinja_env.globals['asset_urls'])
+
+
+def page_url(**changes):
+    return url_for(request.endpoint, **request.view_args, **fyyur.page_args(request.args, **changes))
+
+quart.jinja_env.globals['page_url'] = page_url
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+Session = None
+engine = None
+
+
+@quart.before_serving
+async def start_engine():
+    # asyncpg connections belong to one event loop, so the engine is created on
+    # the server's loop rather than at import.
+    global engine, Session
+    url = make_url(flask_app.config['SQLALCHEMY_DATABASE_URI']).set(drivername='postgresql+asyncpg')
+    engine = create_async_engine(url, **async_engine_options(flask_app.config))
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@quart.after_serving
+async def stop_engine():
+    await engine.dispose()
+
+
+@quart.before_request
+async def push_flask_context():
+    # The shared query builders read their settings from Flask's current_app.
+    g.flask_context = flask_app.app_context()
+    g.flask_context.push()
+
+
+@quart.teardown_request
+async def pop_flask_context(exc):
+    flaskContext = g.pop('flask_context', None)
+    if flaskContext is not None:
+        flaskContext.pop()
+
+
+@quart.after_request
+async def compress_response(response):
+    # The async handlers never stream, so only whole bodies are compressed.
+    compression = fyyur.compression
+    if not flask_app.config['COMPRESS_ENABLED'] or not compression.compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = compression.negotiate(request.accept_encodings)
+    if encoding is None or not compression.applicable(response):
+        return response
+    data = await response.get_data()
+    if len(data) < flask_app.config['COMPRESS_MIN_SIZE']:
+        return response
+    response.set_data(compression.compress_bytes(data, encoding))
+    return compression.mark_encoded(response, encoding)
+
+
+async def fetch_all(statement, *setup):
+    # Each call has its own session and connection so calls can be gathered.
+    async with Session() as session:
+        for setupStatement in setup:
+            await session.execute(setupStatement)
+        return (await session.execute(statement)).all()
+
+
+async def fetch_first(statement):
+    async with Session() as session:
+        return (await session.execute(statement)).first()
+
+
+async def fetch_page(statement, keys):
+    statement, bounds = fyyur.keyset_statement(statement, keys, request.args.get('after'),
+        request.args.get('before'), fyyur.page_size(request.args))
+    return fyyur.keyset_rows(await fetch_all(statement), bounds)
+
+
+async def fetch_detail(model, showKey, schedule, entity_id):
+    # The entity with its validators and its schedule, queried concurrently.
+    # The schedule is fetched even when the request turns out to be
+    # conditional, trading that query for one less round trip on a full page.
+    current_time = datetime.now()
+    row, scheduleRows = await asyncio.gather(
+        fetch_first(fyyur.entity_validators_statement(model, showKey, entity_id, current_time)),
+        fetch_all(schedule(entity_id))
+    )
+    entity, etag, last_modified = fyyur.validators_from_row(model, row)
+    return entity, etag, last_modified, scheduleRows, current_time
+
+
+async def fetch_search(model, counts, search_term, conditions=()):
+    matches = await fetch_all(fyyur.search_statement(model, search_term, conditions), fyyur.similarity_threshold())
+    if not matches:
+        return {}
+    showCounts = dict(await fetch_all(fyyur.upcoming_counts_statement(counts, [match.id for match in matches])))
+    return fyyur.shape_search_results(matches, showCounts)
+
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+
+def json_response(value, status=200):
+    return Response(fyyur.dumps_json(value), status=status, mimetype='application/json')
+
+
+def json_list_response(items, **meta):
+    return json_response({"data": items, **meta})
+
+
+def json_error(message, status):
+    return json_response({"error": message}, status)
+
+
+#----------------------------------------------------------------------------#
+# Pages.
+#----------------------------------------------------------------------------#
+
+@quart.route('/venues')
+async def venues():
+    areas, page, nearest = [], {"next": None, "prev": None}, []
+    conditions, location = fyyur.near_filter(Venue, request.args)
+    try:
+        if location and location['origin']:
+            (rows, page), nearestRows = await asyncio.gather(
+                fetch_page(fyyur.venue_areas_statement(conditions), fyyur.VENUE_AREA_KEYS),
+                fetch_all(fyyur.nearest_statement(Venue, location['origin'],
+                    flask_app.config['NEAREST_DEFAULT_LIMIT'], location['miles']))
+            )
+            nearest = fyyur.shape_nearest(nearestRows)
+        else:
+            rows, page = await fetch_page(fyyur.venue_areas_statement(conditions), fyyur.VENUE_AREA_KEYS)
+        areas = fyyur.fold_venue_areas(rows)
+    except Exception:
+        quart.logger.exception('Could not list venues')
+    return await render_template('pages/venues.html', areas=areas, page=page, location=location, nearest=nearest)
+
+
+@quart.route('/venues/<int:venue_id>')
+async def show_venue(venue_id):
+    # Like the Flask handler, a failed lookup is a 404.
+    try:
+        venue, etag, last_modified, schedule, current_time = await fetch_detail(Venue, Show.venue_id, fyyur.venue_schedule, venue_id)
+    except Exception:
+        quart.logger.exception('Could not load venue')
+        abort(404)
+    if venue is None:
+        abort(404)
+    if fyyur.request_not_modified(etag, last_modified, request):
+        return with_validators(Response('', status=304), etag, last_modified)
+    page = await render_template('pages/show_venue.html', venue=fyyur.venue_detail(venue, current_time, schedule))
+    return with_validators(Response(page), etag, last_modified)
+
+
+@quart.route('/artists')
+async def artists():
+    artistData, page = [], {"next": None, "prev": None}
+    try:
+        rows, page = await fetch_page(fyyur.artist_list_statement(), fyyur.ARTIST_LIST_KEYS)
+        artistData = fyyur.shape_artist_list(rows)
+    except Exception:
+        quart.logger.exception('Could not list artists')
+    return await render_template('pages/artists.html', artists=artistData, page=page)
+
+
+@quart.route('/artists/<int:artist_id>')
+async def show_artist(artist_id):
+    try:
+        artist, etag, last_modified, schedule, current_time = await fetch_detail(Artist, Show.artist_id, fyyur.artist_schedule, artist_id)
+    except Exception:
+        quart.logger.exception('Could not load artist')
+        abort(404)
+    if artist is None:
+        abort(404)
+    if fyyur.request_not_modified(etag, last_modified, request):
+        return with_validators(Response('', status=304), etag, last_modified)
+    page = await render_template('pages/show_artist.html', artist=fyyur.artist_detail(artist, current_time, schedule))
+    return with_validators(Response(page), etag, last_modified)
+
+
+async def shows():
+    showData, page = [], {"next": None, "prev": None}
+    try:
+        rows, page = await fetch_page(fyyur.show_list_statement(), fyyur.SHOW_LIST_KEYS)
+        showData = fyyur.shape_show_list(rows)
+    except Exception:
+        quart.logger.exception('Could not list shows')
+    return await render_template('pages/shows.html', shows=showData, page=page)
+
+# Streamed /shows pages stay with the Flask handler.
+if not flask_app.config['SHOWS_STREAMING']:
+    quart.add_url_rule('/shows', 'shows', shows)
+
+
+@quart.errorhandler(404)
+async def not_found_error(error):
+    return await render_template('errors/404.html'), 404
+
+
+@quart.errorhandler(500)
+async def server_error(error):
+    return await render_template('errors/500.html'), 500
+
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+@api.route('/venues')
+async def list_venues():
+    try:
+        rows, page = await fetch_page(fyyur.venue_areas_statement(fyyur.near_filter(Venue, request.args)[0]),
+            fyyur.VENUE_AREA_KEYS)
+    except Exception:
+        quart.logger.exception('Could not list venues')
+        return json_error('Could not list venues.', 500)
+    return json_list_response(fyyur.fold_venue_areas(rows), next=page['next'], prev=page['prev'])
+
+
+@api.route('/venues/search')
+async def find_venues():
+    try:
+        response = await fetch_search(Venue, venue_upcoming_shows, request.args.get('search_term', ''),
+            fyyur.near_filter(Venue, request.args)[0])
+    except Exception:
+        quart.logger.exception('Could not search venues')
+        return json_error('Could not search venues.', 500)
+    return json_response(response or {"count": 0, "data": []})
+
+
+@api.route('/venues/<int:venue_id>')
+async def get_venue(venue_id):
+    try:
+        venue, etag, last_modified, schedule, current_time = await fetch_detail(Venue, Show.venue_id, fyyur.venue_schedule, venue_id)
+    except Exception:
+        quart.logger.exception('Could not load venue')
+        return json_error('Could not load venue.', 500)
+    if venue is None:
+        return json_error('Venue not found.', 404)
+    if fyyur.request_not_modified(etag, last_modified, request):
+        return with_validators(Response('', status=304), etag, last_modified)
+    return with_validators(json_response(fyyur.venue_detail(venue, current_time, schedule)), etag, last_modified)
+
+
+@api.route('/artists')
+async def list_artists():
+    try:
+        rows, page = await fetch_page(fyyur.artist_list_statement(), fyyur.ARTIST_LIST_KEYS)
+    except Exception:
+        quart.logger.exception('Could not list artists')
+        return json_error('Could not list artists.', 500)
+    return json_list_response(fyyur.shape_artist_list(rows), next=page['next'], prev=page['prev'])
+
+
+@api.route('/artists/search')
+async def find_artists():
+    try:
+        response = await fetch_search(Artist, artist_upcoming_shows, request.args.get('search_term', ''))
+    except Exception:
+        quart.logger.exception('Could not search artists')
+        return json_error('Could not search artists.', 500)
+    return json_response(response or {"count": 0, "data": []})
+
+
+@api.route('/artists/<int:artist_id>')
+async def get_artist(artist_id):
+    try:
+        artist, etag, last_modified, schedule, current_time = await fetch_detail(Artist, Show.artist_id, fyyur.artist_schedule, artist_id)
+    except Exception:
+        quart.logger.exception('Could not load artist')
+        return json_error('Could not load artist.', 500)
+    if artist is None:
+        return json_error('Artist not found.', 404)
+    if fyyur.request_not_modified(etag, last_modified, request):
+        return with_validators(Response('', status=304), etag, last_modified)
+    return with_validators(json_response(fyyur.artist_detail(artist, current_time, schedule)), etag, last_modified)
+
+
+@api.route('/shows')
+async def list_shows():
+    try:
+        rows, page = await fetch_page(fyyur.show_list_statement(), fyyur.SHOW_LIST_KEYS)
+    except Exception:
+        quart.logger.exception('Could not list shows')
+        return json_error('Could not list shows.', 500)
+    return json_list_response(fyyur.shape_show_list(rows), next=page['next'], prev=page['prev'])
+
+
+quart.register_blueprint(api)
+
+#----------------------------------------------------------------------------#
+# Routing between the async handlers and the Flask app.
+#----------------------------------------------------------------------------#
+
+ASYNC_ENDPOINTS = set(quart.view_functions)
+
+
+async def delegated():
+    # Never called: requests for Flask endpoints are routed to Flask before
+    # they reach Quart. The rules exist so url_for works in async templates.
+    abort(404)
+
+for rule in flask_app.url_map.iter_rules():
+    if rule.endpoint not in ASYNC_ENDPOINTS:
+        quart.add_url_rule(rule.rule, rule.endpoint, delegated, methods=rule.methods - {'HEAD', 'OPTIONS'})
+
+flask_application = WsgiToAsgi(flask_app)
+
+
+def handled_async(scope):
+    try:
+        endpoint, _ = quart.url_map.bind('').match(scope['path'], method=scope['method'])
+    except HTTPException:
+        return False
+    return endpoint in ASYNC_ENDPOINTS
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan' or (scope['type'] == 'http' and handled_async(scope)):
+        await quart(scope, receive, send)
+    else:
+        await flask_application(scope, receive, send)
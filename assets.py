@@ -0,0 +1,175 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+
+# Fingerprinted static assets.
+#
+# 'flask build-assets' concatenates each bundle's source files into one
+# content-hashed file under static/dist, together with every file the CSS
+# refers to through url(), and writes .gz (and, with the brotli package, .br)
+# variants next to each one. Templates link to assets through asset_url() and
+# asset_urls(), which resolve names through static/dist/manifest.json. Files
+# under /static/dist are served with a one year immutable Cache-Control, so
+# once a browser has them a page view makes no static requests at all. Before
+# the first build, or with a name missing from the manifest, the helpers fall
+# back to the unbundled source files.
+
+BUNDLES = {
+    'main.css': [
+        'css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css', 'css/main.responsive.css',
+        'css/main.quickfix.css'
+    ],
+    'head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    'main.js': [
+        'js/libs/jquery-1.11.1.min.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js', 'js/script.js'
+    ],
+}
+
+# Single files linked from templates outside any bundle.
+FILES = ['js/libs/respond-1.4.2.min.js', 'img/front-splash.jpg']
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.map', '.ttf', '.eot', '.otf')
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+
+
+def fingerprinted(name, content):
+    root, extension = os.path.splitext(name)
+    return f'{root}.{hashlib.sha256(content).hexdigest()[:12]}{extension}'
+
+
+def minify_css(css):
+    # rcssmin when installed; otherwise only comments and blank runs are
+    # removed, which is always safe.
+    if rcssmin is not None:
+        return rcssmin.cssmin(css)
+    css = CSS_COMMENT.sub('', css)
+    return re.sub(r'\s*\n\s*', '\n', css).strip()
+
+
+def build(static_folder):
+    # Rebuild static/dist from scratch and return the manifest.
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+    manifest = {}
+
+    def emit(name, content):
+        output = fingerprinted(name, content)
+        path = os.path.join(dist, output)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as outputFile:
+            outputFile.write(content)
+        if output.endswith(COMPRESSIBLE):
+            with open(path + '.gz', 'wb') as outputFile:
+                outputFile.write(gzip.compress(content, 9))
+            if brotli is not None:
+                with open(path + '.br', 'wb') as outputFile:
+                    outputFile.write(brotli.compress(content, quality=11))
+        manifest[name] = output
+        return output
+
+    def emit_file(name):
+        if name not in manifest:
+            with open(os.path.join(static_folder, name), 'rb') as source:
+                emit(name, source.read())
+        return manifest[name]
+
+    def rewrite_urls(source, css):
+        # Point url() references at fingerprinted copies, relative to dist.
+        def replace(match):
+            target = match.group(2)
+            if target.startswith(('data:', 'http:', 'https:', '//', '#')):
+                return match.group(0)
+            path, _, suffix = target.partition('?')
+            path, hashMark, fragment = path.partition('#')
+            name = os.path.normpath(os.path.join(os.path.dirname(source), path)).replace(os.sep, '/')
+            if not os.path.isfile(os.path.join(static_folder, name)):
+                return match.group(0)
+            suffix = ('?' + suffix if suffix else '') + (hashMark + fragment)
+            return f'url("{emit_file(name)}{suffix}")'
+        return CSS_URL.sub(replace, css)
+
+    for name in FILES:
+        emit_file(name)
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as sourceFile:
+                content = sourceFile.read()
+            if name.endswith('.css'):
+                content = minify_css(rewrite_urls(source, content))
+            parts.append(content)
+        # Scripts are already minified; ';' guards against files without a
+        # trailing semicolon running into each other.
+        separator = '\n' if name.endswith('.css') else ';\n'
+        emit(name, separator.join(parts).encode('utf-8'))
+
+    with open(os.path.join(dist, MANIFEST), 'w') as manifestFile:
+        json.dump(manifest, manifestFile, indent=2, sort_keys=True)
+    return manifest
+
+
+class Assets(object):
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.url_path = app.static_url_path
+        self.max_age = app.config['ASSETS_MAX_AGE']
+        self.manifest = {}
+        manifestPath = os.path.join(app.static_folder, DIST, MANIFEST)
+        if os.path.exists(manifestPath):
+            with open(manifestPath) as manifestFile:
+                self.manifest = json.load(manifestFile)
+        app.add_url_rule(f'{self.url_path}/{DIST}/<path:filename>', 'asset', self.send_asset)
+        app.jinja_env.globals.update(asset_url=self.url, asset_urls=self.urls)
+
+    def url(self, name):
+        if name in self.manifest:
+            return f'{self.url_path}/{DIST}/{self.manifest[name]}'
+        return f'{self.url_path}/{name}'
+
+    def urls(self, bundle):
+        # One fingerprinted URL for a built bundle, else its source files.
+        if bundle in self.manifest:
+            return [self.url(bundle)]
+        return [self.url(source) for source in BUNDLES[bundle]]
+
+    def send_asset(self, filename):
+        dist = os.path.join(self.static_folder, DIST)
+        accepted = request.accept_encodings
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[encoding] and os.path.isfile(os.path.join(dist, filename + suffix)):
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response = send_from_directory(dist, filename + suffix, max_age=self.max_age, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(dist, filename, max_age=self.max_age)
+        # Fingerprinted names change whenever their content does.
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}, immutable'
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,172 @@
+import csv
+import io
+import random
+from itertools import accumulate
+from datetime import datetime, timedelta
+
+
+# Deterministic synthetic catalog for benchmarks.
+#
+# The same scale and seed always produce the same rows. Show times are
+# offsets from the day of seeding, so about a quarter of shows are upcoming
+# whenever the benchmark runs. Cities and genres follow a Zipf-like skew so a
+# few areas and genres dominate, as in the real catalog. Rows are loaded with
+# COPY into an existing schema (run migrations first).
+
+SCALES = {
+    'tiny': {"venues": 100, "artists": 1000, "shows": 10000},
+    'small': {"venues": 1000, "artists": 10000, "shows": 100000},
+    'medium': {"venues": 10000, "artists": 100000, "shows": 1000000},
+}
+
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'), ('Phoenix', 'AZ'),
+    ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'), ('Dallas', 'TX'), ('San Jose', 'CA'),
+    ('Austin', 'TX'), ('Jacksonville', 'FL'), ('Fort Worth', 'TX'), ('Columbus', 'OH'), ('Charlotte', 'NC'),
+    ('San Francisco', 'CA'), ('Indianapolis', 'IN'), ('Seattle', 'WA'), ('Denver', 'CO'), ('Washington', 'DC'),
+    ('Boston', 'MA'), ('El Paso', 'TX'), ('Nashville', 'TN'), ('Detroit', 'MI'), ('Oklahoma City', 'OK'),
+    ('Portland', 'OR'), ('Las Vegas', 'NV'), ('Memphis', 'TN'), ('Louisville', 'KY'), ('Baltimore', 'MD'),
+    ('Milwaukee', 'WI'), ('Albuquerque', 'NM'), ('Tucson', 'AZ'), ('Fresno', 'CA'), ('Sacramento', 'CA'),
+    ('Kansas City', 'MO'), ('Atlanta', 'GA'), ('Miami', 'FL'), ('Raleigh', 'NC'), ('Omaha', 'NE'),
+    ('Minneapolis', 'MN'), ('Tulsa', 'OK'), ('Cleveland', 'OH'), ('New Orleans', 'LA'), ('Tampa', 'FL'),
+    ('Honolulu', 'HI'), ('Anchorage', 'AK'), ('Pittsburgh', 'PA'), ('Cincinnati', 'OH'), ('St. Louis', 'MO'),
+]
+
+# City centres; rows are scattered up to about 10 km around them, so near
+# searches can be benchmarked without a gazetteer.
+CITY_LOCATIONS = {
+    'New York': (40.71, -74.01), 'Los Angeles': (34.05, -118.24), 'Chicago': (41.88, -87.63),
+    'Houston': (29.76, -95.37), 'Phoenix': (33.45, -112.07), 'Philadelphia': (39.95, -75.17),
+    'San Antonio': (29.42, -98.49), 'San Diego': (32.72, -117.16), 'Dallas': (32.78, -96.80),
+    'San Jose': (37.34, -121.89), 'Austin': (30.27, -97.74), 'Jacksonville': (30.33, -81.66),
+    'Fort Worth': (32.76, -97.33), 'Columbus': (39.96, -83.00), 'Charlotte': (35.23, -80.84),
+    'San Francisco': (37.77, -122.42), 'Indianapolis': (39.77, -86.16), 'Seattle': (47.61, -122.33),
+    'Denver': (39.74, -104.99), 'Washington': (38.91, -77.04), 'Boston': (42.36, -71.06),
+    'El Paso': (31.76, -106.49), 'Nashville': (36.16, -86.78), 'Detroit': (42.33, -83.05),
+    'Oklahoma City': (35.47, -97.52), 'Portland': (45.52, -122.68), 'Las Vegas': (36.17, -115.14),
+    'Memphis': (35.15, -90.05), 'Louisville': (38.25, -85.76), 'Baltimore': (39.29, -76.61),
+    'Milwaukee': (43.04, -87.91), 'Albuquerque': (35.08, -106.65), 'Tucson': (32.22, -110.97),
+    'Fresno': (36.74, -119.79), 'Sacramento': (38.58, -121.49), 'Kansas City': (39.10, -94.58),
+    'Atlanta': (33.75, -84.39), 'Miami': (25.76, -80.19), 'Raleigh': (35.78, -78.64),
+    'Omaha': (41.26, -95.93), 'Minneapolis': (44.98, -93.27), 'Tulsa': (36.15, -95.99),
+    'Cleveland': (41.50, -81.69), 'New Orleans': (29.95, -90.07), 'Tampa': (27.95, -82.46),
+    'Honolulu': (21.31, -157.86), 'Anchorage': (61.22, -149.90), 'Pittsburgh': (40.44, -80.00),
+    'Cincinnati': (39.10, -84.51), 'St. Louis': (38.63, -90.20),
+}
+
+GENRES = [
+    'Rock n Roll', 'Pop', 'Hip-Hop', 'Country', 'Jazz', 'R&B', 'Electronic', 'Alternative', 'Folk',
+    'Blues', 'Soul', 'Punk', 'Heavy Metal', 'Reggae', 'Funk', 'Classical', 'Instrumental',
+    'Musical Theatre', 'Other',
+]
+
+NAME_WORDS = [
+    'Velvet', 'Electric', 'Golden', 'Midnight', 'Crimson', 'Silver', 'Blue', 'Wild', 'Neon', 'Lucky',
+    'Iron', 'Paper', 'Hollow', 'Broken', 'Crystal', 'Howling', 'Little', 'Northern', 'Rusty', 'Static',
+]
+
+
+def zipf_weights(count, exponent=1.1):
+    # Cumulative weights, so each draw is a bisect rather than a pass over all ranks.
+    return list(accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def generate(scale, seed=0, now=None):
+    # Returns (venues, artists, shows) as lists of CSV-ready tuples with
+    # explicit ids starting at 1.
+    sizes = SCALES[scale]
+    rng = random.Random(seed)
+    now = now or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    cityWeights = zipf_weights(len(CITIES))
+    genreWeights = zipf_weights(len(GENRES))
+
+    def genres():
+        picked = set(rng.choices(GENRES, cum_weights=genreWeights, k=rng.randint(1, 3)))
+        return '{' + ','.join('"' + genre + '"' for genre in sorted(picked)) + '}'
+
+    def name(kind, index):
+        return f'{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {kind} {index}'
+
+    def near(city):
+        latitude, longitude = CITY_LOCATIONS[city]
+        return round(latitude + rng.uniform(-0.09, 0.09), 5), round(longitude + rng.uniform(-0.09, 0.09), 5)
+
+    venues = []
+    for index in range(1, sizes['venues'] + 1):
+        city, state = rng.choices(CITIES, cum_weights=cityWeights)[0]
+        venues.append((
+            index, name('Hall', index), city, state, f'{rng.randint(1, 9999)} Main St',
+            f'{rng.randint(200, 999)}-555-{rng.randint(0, 9999):04d}', genres(),
+            f'https://images.example.com/venues/{index}.jpg', f'https://www.facebook.com/venue{index}',
+            f'https://venue{index}.example.com', rng.random() < 0.6, 'Looking for local acts.', *near(city)
+        ))
+
+    artists = []
+    for index in range(1, sizes['artists'] + 1):
+        city, state = rng.choices(CITIES, cum_weights=cityWeights)[0]
+        artists.append((
+            index, name('Band', index), city, state, f'{rng.randint(200, 999)}-555-{rng.randint(0, 9999):04d}',
+            genres(), f'https://images.example.com/artists/{index}.jpg', f'https://www.facebook.com/artist{index}',
+            f'https://artist{index}.example.com', rng.random() < 0.5, 'Looking for venues.', *near(city)
+        ))
+
+    # Popular venues and artists host most shows; (artist, venue) pairs are
+    # unique. Shows last the default two hours and start on the hour, so a
+    # venue's shows never overlap as long as their start hours differ by two.
+    venueWeights = zipf_weights(sizes['venues'], 0.8)
+    artistWeights = zipf_weights(sizes['artists'], 0.8)
+    shows = []
+    pairs = set()
+    booked = set()
+    while len(shows) < sizes['shows']:
+        batch = sizes['shows'] - len(shows)
+        venueIds = rng.choices(range(1, sizes['venues'] + 1), cum_weights=venueWeights, k=batch)
+        artistIds = rng.choices(range(1, sizes['artists'] + 1), cum_weights=artistWeights, k=batch)
+        for artistId, venueId in zip(artistIds, venueIds):
+            if (artistId, venueId) in pairs:
+                continue
+            startTime = now + timedelta(days=rng.randint(-730, 240), hours=rng.randint(18, 23))
+            startTime = startTime.replace(minute=0, second=0, microsecond=0)
+            hour = startTime.toordinal() * 24 + startTime.hour
+            if any((venueId, hour + offset) in booked for offset in (-1, 0, 1)):
+                continue
+            pairs.add((artistId, venueId))
+            booked.add((venueId, hour))
+            shows.append((artistId, venueId, startTime))
+    return venues, artists, shows
+
+
+def copy_rows(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def seed(connection, scale, seed=0):
+    # Replace the catalog on a raw DB-API connection with the generated one.
+    venues, artists, shows = generate(scale, seed)
+    cursor = connection.cursor()
+    try:
+        cursor.execute('TRUNCATE show, venue, artist RESTART IDENTITY CASCADE')
+        copy_rows(cursor, 'venue', ['id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+            'facebook_link', 'website', 'seeking_talent', 'seeking_description', 'latitude', 'longitude'], venues)
+        copy_rows(cursor, 'artist', ['id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+            'facebook_link', 'website', 'seeking_venue', 'seeking_description', 'latitude', 'longitude'], artists)
+        # Partitions for every month the shows span, so COPY routes them into
+        # the same layout production has rather than into show_default.
+        startTimes = [show[2] for show in shows]
+        cursor.execute('SELECT create_show_partitions(%s, %s)', (min(startTimes).date(), max(startTimes).date()))
+        copy_rows(cursor, 'show', ['artist_id', 'venue_id', 'start_time'], shows)
+        cursor.execute("SELECT setval('venue_id_seq', (SELECT max(id) FROM venue))")
+        cursor.execute("SELECT setval('artist_id_seq', (SELECT max(id) FROM artist))")
+        connection.commit()
+        cursor.execute('ANALYZE venue')
+        cursor.execute('ANALYZE artist')
+        cursor.execute('ANALYZE show')
+        for view in ('venue_upcoming_shows', 'artist_upcoming_shows', 'venue_facets', 'artist_facets'):
+            cursor.execute(f'REFRESH MATERIALIZED VIEW {view}')
+        connection.commit()
+    finally:
+        cursor.close()
+    return {"venues": len(venues), "artists": len(artists), "shows": len(shows)}
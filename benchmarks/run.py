@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.startup import BENCHMARK_SECRET_KEY, measure_startup
+
+
+# Route-level benchmarks.
+#
+#   python -m benchmarks.run seed --scale small --database-url postgresql://localhost/fyyur_bench
+#   python -m benchmarks.run run --scales tiny,small --database-url postgresql://localhost/fyyur_bench
+#   python -m benchmarks.run compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+#
+# 'run' migrates and seeds the given database at each scale (replacing its
+# catalog, so never point it at real data), then times every route in app.py
+# through the Flask test client and records latency percentiles, statement
+# counts and database time from the X-DB-Stats header, plus the cold start
+# time and memory of a worker (see startup.py). Results are written as JSON
+# named after the current commit; 'compare' exits non-zero when a route got
+# slower than the tolerance or runs more statements than before, or when
+# startup exceeds its budgets.
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def load_app(database_url):
+    # config.py reads DATABASE_URL at import, so set it before importing app.
+    # The module gives access to models and helpers; fyyur.app is the app
+    # built for the benchmark. create_app refuses to start without a
+    # SECRET_KEY outside debug mode, and a throwaway one is fine here.
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('SECRET_KEY', BENCHMARK_SECRET_KEY)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as fyyur
+    fyyur.app = fyyur.create_app()
+    fyyur.app.config.update(
+        WTF_CSRF_ENABLED=False,
+        RESPONSE_CACHE_ENABLED=False,
+        SQL_STATS_HEADER=True
+    )
+    return fyyur
+
+
+def seed_database(fyyur, scale, seed):
+    from flask_migrate import upgrade
+    from benchmarks.dataset import seed as seed_catalog
+    with fyyur.app.app_context():
+        upgrade()
+        connection = fyyur.db.engine.raw_connection()
+        try:
+            return seed_catalog(connection, scale, seed)
+        finally:
+            connection.close()
+
+
+def middle_cursor(fyyur, keys):
+    # Cursor for a page half way through the table, to check deep pages cost
+    # the same as the first one.
+    query = fyyur.db.session.query(*keys).order_by(*keys)
+    count = query.count()
+    row = query.offset(count // 2).first()
+    fyyur.db.session.close()
+    return fyyur.encode_cursor(list(row)) if row else ''
+
+
+def read_routes(fyyur):
+    with fyyur.app.app_context():
+        venueCursor = middle_cursor(fyyur, [fyyur.Venue.state, fyyur.Venue.city, fyyur.Venue.name, fyyur.Venue.id])
+        artistCursor = middle_cursor(fyyur, [fyyur.Artist.name, fyyur.Artist.id])
+        showCursor = middle_cursor(fyyur, [fyyur.Show.start_time, fyyur.Show.artist_id, fyyur.Show.venue_id])
+    # An evening a week out, when many shows are booked.
+    evening = (datetime.now() + timedelta(days=7)).replace(hour=19, minute=0, second=0, microsecond=0)
+    window = f"start={evening:%Y-%m-%dT%H:%M}&end={evening + timedelta(hours=4):%Y-%m-%dT%H:%M}"
+    return [
+        ('index', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('venues_deep_page', 'GET', '/venues?after=' + venueCursor, None),
+        ('show_venue', 'GET', '/venues/1', None),
+        ('search_venues', 'POST', '/venues/search', {"search_term": "hall"}),
+        ('search_venues_near_miss', 'POST', '/venues/search', {"search_term": "velvte hal"}),
+        ('browse_venues', 'GET', '/venues/browse', None),
+        ('browse_venues_filtered', 'GET', '/venues/browse?genres=Rock+n+Roll&state=TX&city=austin', None),
+        ('venue_availability', 'GET', '/venues/availability?city=Austin&state=TX&genres=Rock+n+Roll&' + window, None),
+        ('venue_availability_anywhere', 'GET', '/venues/availability?' + window, None),
+        ('venues_near', 'GET', '/venues?lat=30.27&lng=-97.74&within=50', None),
+        ('create_venue_form', 'GET', '/venues/create', None),
+        ('edit_venue', 'GET', '/venues/1/edit', None),
+        ('artists', 'GET', '/artists', None),
+        ('artists_deep_page', 'GET', '/artists?after=' + artistCursor, None),
+        ('show_artist', 'GET', '/artists/1', None),
+        ('search_artists', 'POST', '/artists/search', {"search_term": "band"}),
+        ('browse_artists', 'GET', '/artists/browse', None),
+        ('browse_artists_filtered', 'GET', '/artists/browse?genres=Jazz&genres=Blues&state=TX&seeking=1', None),
+        ('create_artist_form', 'GET', '/artists/create', None),
+        ('edit_artist', 'GET', '/artists/1/edit', None),
+        ('shows', 'GET', '/shows', None),
+        ('shows_deep_page', 'GET', '/shows?after=' + showCursor, None),
+        ('create_show_form', 'GET', '/shows/create', None),
+        ('api_venues', 'GET', '/api/v1/venues', None),
+        ('api_venue', 'GET', '/api/v1/venues/1', None),
+        ('api_artists', 'GET', '/api/v1/artists', None),
+        ('api_artist', 'GET', '/api/v1/artists/1', None),
+        ('api_shows', 'GET', '/api/v1/shows', None),
+        ('api_search_venues', 'GET', '/api/v1/venues/search?search_term=hall', None),
+        ('api_nearest_venues', 'GET', '/api/v1/venues/near?lat=30.27&lng=-97.74&limit=20', None),
+        ('api_nearest_artists_within', 'GET', '/api/v1/artists/near?lat=40.71&lng=-74.01&within=25&limit=100', None),
+    ]
+
+
+def venue_form(name):
+    return {
+        "name": name, "city": "Austin", "state": "TX", "address": "1 Bench St", "phone": "512-555-0100",
+        "genres": ["Jazz", "Blues"], "image_link": "https://images.example.com/bench.jpg",
+        "website": "https://bench.example.com", "facebook_link": "https://www.facebook.com/bench",
+        "seeking_talent": "y", "seeking_description": "Benchmark venue."
+    }
+
+
+def artist_form(name):
+    return {
+        "name": name, "city": "Austin", "state": "TX", "phone": "512-555-0101", "genres": ["Jazz"],
+        "image_link": "https://images.example.com/bench.jpg", "website": "https://bench.example.com",
+        "facebook_link": "https://www.facebook.com/bench", "seeking_venue": "y",
+        "seeking_description": "Benchmark artist."
+    }
+
+
+def entity_id(fyyur, model, name):
+    with fyyur.app.app_context():
+        row = model.query.with_entities(model.id).filter_by(name=name).first()
+        fyyur.db.session.close()
+        return row.id if row else 0
+
+
+def write_steps(fyyur, tag):
+    # One iteration of every write route. Paths and forms are built lazily
+    # (outside the timed request) since they depend on rows created earlier.
+    def venue(i, suffix=''):
+        return f'Bench Venue {tag} {i}{suffix}'
+
+    def artist(i):
+        return f'Bench Artist {tag} {i}'
+
+    startTime = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
+    return [
+        ('create_venue', 'POST', lambda i: '/venues/create', lambda i: venue_form(venue(i))),
+        ('create_artist', 'POST', lambda i: '/artists/create', lambda i: artist_form(artist(i))),
+        ('create_show', 'POST', lambda i: '/shows/create', lambda i: {
+            "artist_id": str(entity_id(fyyur, fyyur.Artist, artist(i))),
+            "venue_id": str(entity_id(fyyur, fyyur.Venue, venue(i))),
+            "start_time": startTime,
+            "duration": '120'
+        }),
+        ('edit_venue_submission', 'POST', lambda i: f'/venues/{entity_id(fyyur, fyyur.Venue, venue(i))}/edit',
+            lambda i: venue_form(venue(i))),
+        ('edit_artist_submission', 'POST', lambda i: f'/artists/{entity_id(fyyur, fyyur.Artist, artist(i))}/edit',
+            lambda i: artist_form(artist(i))),
+        ('create_venue_to_delete', 'POST', lambda i: '/venues/create', lambda i: venue_form(venue(i, ' deleted'))),
+        ('delete_venue', 'DELETE', lambda i: f"/venues/{entity_id(fyyur, fyyur.Venue, venue(i, ' deleted'))}", lambda i: None),
+    ]
+
+
+def timed_request(client, method, path, data):
+    start = time.perf_counter()
+    response = client.open(path, method=method, data=data)
+    response.get_data()
+    elapsed = time.perf_counter() - start
+    stats = dict(
+        part.strip().split('=') for part in response.headers.get('X-DB-Stats', '').split(';') if '=' in part
+    )
+    return elapsed, response.status_code, int(stats.get('statements', 0)), float(stats.get('time_ms', 0.0))
+
+
+def summarize(samples):
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    return {
+        "iterations": len(samples),
+        "status": sorted({sample[1] for sample in samples}),
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "mean_ms": statistics.mean(latencies),
+        "min_ms": latencies[0],
+        "max_ms": latencies[-1],
+        "statements": max(sample[2] for sample in samples),
+        "db_ms_p50": statistics.median(sample[3] for sample in samples),
+    }
+
+
+def benchmark_scale(fyyur, scale, args):
+    results = {}
+    client = fyyur.app.test_client()
+    for name, method, path, data in read_routes(fyyur):
+        for _ in range(args.warmup):
+            timed_request(client, method, path, data)
+        results[name] = summarize([timed_request(client, method, path, data) for _ in range(args.iterations)])
+
+    samples = {}
+    steps = write_steps(fyyur, f'{scale} {int(time.time())}')
+    for i in range(args.iterations):
+        for name, method, path, data in steps:
+            samples.setdefault(name, []).append(timed_request(client, method, path(i), data(i)))
+    for name, routeSamples in samples.items():
+        results[name] = summarize(routeSamples)
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(args):
+    fyyur = load_app(args.database_url)
+    report = {
+        "commit": current_commit(),
+        "created": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "startup": measure_startup(args.database_url),
+        "scales": {}
+    }
+    print('Startup: ' + ', '.join(f'{name} {value:.1f}' for name, value in report['startup'].items()))
+    for scale in args.scales.split(','):
+        rows = seed_database(fyyur, scale, args.seed)
+        print(f'Seeded {scale}: {rows}')
+        report['scales'][scale] = {"rows": rows, "routes": benchmark_scale(fyyur, scale, args)}
+        for name, result in report['scales'][scale]['routes'].items():
+            print(f"  {scale:8} {name:28} p50 {result['p50_ms']:8.1f}ms  p95 {result['p95_ms']:8.1f}ms  {result['statements']:4} statements")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as outputFile:
+        json.dump(report, outputFile, indent=2, sort_keys=True)
+    print(f'Wrote {output}')
+
+
+def compare(args):
+    with open(args.baseline) as baselineFile, open(args.candidate) as candidateFile:
+        baseline, candidate = json.load(baselineFile), json.load(candidateFile)
+    regressions = []
+    startup = candidate.get('startup')
+    if startup:
+        # Absolute budgets, then growth against the baseline.
+        if startup['import_ms'] + startup['create_app_ms'] > args.startup_budget_ms:
+            regressions.append(f"startup: {startup['import_ms'] + startup['create_app_ms']:.0f}ms over the {args.startup_budget_ms:.0f}ms budget")
+        if startup['rss_mb'] > args.rss_budget_mb:
+            regressions.append(f"startup: worker RSS {startup['rss_mb']:.0f}MB over the {args.rss_budget_mb:.0f}MB budget")
+        old = baseline.get('startup')
+        if old and startup['import_ms'] > old['import_ms'] * (1 + args.tolerance) and startup['import_ms'] - old['import_ms'] > args.min_delta_ms:
+            regressions.append(f"startup: import {old['import_ms']:.0f}ms -> {startup['import_ms']:.0f}ms")
+        if old and startup['rss_mb'] > old['rss_mb'] * (1 + args.tolerance):
+            regressions.append(f"startup: worker RSS {old['rss_mb']:.0f}MB -> {startup['rss_mb']:.0f}MB")
+    for scale, scaleResults in candidate['scales'].items():
+        before = baseline['scales'].get(scale, {}).get('routes', {})
+        for name, result in scaleResults['routes'].items():
+            if name not in before:
+                continue
+            old = before[name]
+            if result['p50_ms'] > old['p50_ms'] * (1 + args.tolerance) and result['p50_ms'] - old['p50_ms'] > args.min_delta_ms:
+                regressions.append(f"{scale} {name}: p50 {old['p50_ms']:.1f}ms -> {result['p50_ms']:.1f}ms")
+            if result['statements'] > old['statements']:
+                regressions.append(f"{scale} {name}: statements {old['statements']} -> {result['statements']}")
+    for regression in regressions:
+        print(regression)
+    print(f"{len(regressions)} regressions between {baseline['commit']} and {candidate['commit']}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fyyur route benchmarks.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seedCommand = commands.add_parser('seed', help='Migrate and seed a benchmark database.')
+    seedCommand.add_argument('--scale', default='small')
+    seedCommand.add_argument('--seed', type=int, default=0)
+    seedCommand.add_argument('--database-url', required=True)
+
+    runCommand = commands.add_parser('run', help='Seed each scale and time every route.')
+    runCommand.add_argument('--scales', default='tiny,small')
+    runCommand.add_argument('--seed', type=int, default=0)
+    runCommand.add_argument('--database-url', required=True)
+    runCommand.add_argument('--iterations', type=int, default=20)
+    runCommand.add_argument('--warmup', type=int, default=3)
+    runCommand.add_argument('--output')
+
+    compareCommand = commands.add_parser('compare', help='Compare two result files.')
+    compareCommand.add_argument('baseline')
+    compareCommand.add_argument('candidate')
+    compareCommand.add_argument('--tolerance', type=float, default=0.25,
+        help='Allowed relative p50 slowdown before a route counts as regressed.')
+    compareCommand.add_argument('--min-delta-ms', type=float, default=1.0,
+        help='Ignore slowdowns smaller than this many milliseconds.')
+    compareCommand.add_argument('--startup-budget-ms', type=float, default=1500.0,
+        help='Maximum import plus create_app() time of a fresh worker.')
+    compareCommand.add_argument('--rss-budget-mb', type=float, default=150.0,
+        help='Maximum resident memory of a fresh worker after one request.')
+
+    args = parser.parse_args(argv)
+    if args.command == 'seed':
+        print(seed_database(load_app(args.database_url), args.scale, args.seed))
+        return 0
+    if args.command == 'run':
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+
+# Cold start cost of a worker: import time of app.py, create_app() time, and
+# the resident set size after serving one request. Measured in a fresh
+# interpreter so nothing is already imported or cached.
+
+# Sessions signed with it only live as long as one benchmark run.
+BENCHMARK_SECRET_KEY = 'fyyur-benchmark'
+
+MEASURE = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+import app as fyyur
+imported = time.perf_counter()
+application = fyyur.create_app()
+created = time.perf_counter()
+application.test_client().get('/')
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "rss_mb": rss / 1024 if sys.platform != 'darwin' else rss / 1024 / 1024,
+    "modules": len(sys.modules)
+}))
+'''
+
+
+def measure_startup(database_url, runs=5):
+    # Median of several cold starts; the first run also warms the OS file cache.
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, DATABASE_URL=database_url)
+    env.setdefault('SECRET_KEY', BENCHMARK_SECRET_KEY)
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', MEASURE], cwd=root, env=env, text=True)
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {name: sorted(sample[name] for sample in samples)[len(samples) // 2] for name in samples[0]}
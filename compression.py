@@ -0,0 +1,159 @@
+import threading
+import zlib
+
+from flask import jsonify, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Dynamic response compression.
+#
+# Responses whose mimetype is in COMPRESS_MIMETYPES are compressed with
+# brotli or gzip, whichever the client prefers in Accept-Encoding (brotli
+# wins ties, and needs the brotli package). Buffered bodies smaller than
+# COMPRESS_MIN_SIZE are sent as they are. Streamed responses are compressed
+# chunk by chunk and flushed after every chunk, so the browser can still
+# render as rows arrive. ETags are made weak, since the compressed bytes
+# differ from the ones the strong ETag described. Bytes before and after
+# compression are counted per worker at /compression/stats.
+
+class GzipStream(object):
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliStream(object):
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionStats(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.encodings = {}
+
+    def record(self, encoding, original, compressed):
+        with self._lock:
+            stats = self.encodings.setdefault(encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0})
+            stats["responses"] += 1
+            stats["bytes_in"] += original
+            stats["bytes_out"] += compressed
+
+    def snapshot(self):
+        with self._lock:
+            encodings = {encoding: dict(stats) for encoding, stats in self.encodings.items()}
+        bytesIn = sum(stats["bytes_in"] for stats in encodings.values())
+        bytesOut = sum(stats["bytes_out"] for stats in encodings.values())
+        return {
+            "encodings": encodings,
+            "bytes_in": bytesIn,
+            "bytes_out": bytesOut,
+            "bytes_saved": bytesIn - bytesOut,
+            "ratio": bytesOut / bytesIn if bytesIn else None
+        }
+
+
+class Compression(object):
+
+    def __init__(self, app=None):
+        self.stats = CompressionStats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.config = app.config
+        if not app.config['COMPRESS_ENABLED']:
+            return
+        app.after_request(self.compress_response)
+        app.add_url_rule('/compression/stats', 'compression_stats', lambda: jsonify(self.stats.snapshot()))
+
+    def negotiate(self, accept_encodings):
+        # The best encoding the client accepts, or None.
+        offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+        return accept_encodings.best_match(offered)
+
+    def stream(self, encoding):
+        if encoding == 'br':
+            return BrotliStream(self.config['COMPRESS_BROTLI_LEVEL'])
+        return GzipStream(self.config['COMPRESS_GZIP_LEVEL'])
+
+    def compress_bytes(self, data, encoding):
+        stream = self.stream(encoding)
+        compressed = stream.compress(data) + stream.finish()
+        self.stats.record(encoding, len(data), len(compressed))
+        return compressed
+
+    def compressible(self, response):
+        # Only the content type decides whether Vary is needed: any response
+        # of an allowed type could have been compressed for another client.
+        return response.mimetype in self.config['COMPRESS_MIMETYPES']
+
+    def applicable(self, response):
+        return (
+            200 <= response.status_code < 300 and response.status_code not in (204, 206)
+            and 'Content-Encoding' not in response.headers
+        )
+
+    def compress_response(self, response):
+        # Files sent by send_file are left alone; fingerprinted static assets
+        # are compressed ahead of time (see assets.py).
+        if not self.compressible(response) or response.direct_passthrough:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None or not self.applicable(response):
+            return response
+
+        if response.is_streamed:
+            response.response = self.compress_chunks(response.response, response.iter_encoded(), encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.config['COMPRESS_MIN_SIZE']:
+                return response
+            response.set_data(self.compress_bytes(data, encoding))
+        return self.mark_encoded(response, encoding)
+
+    def mark_encoded(self, response, encoding):
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def compress_chunks(self, iterable, chunks, encoding):
+        # Closes the original iterable when done, e.g. to release a cursor.
+        stream = self.stream(encoding)
+        original = compressed = 0
+        try:
+            for chunk in chunks:
+                data = stream.compress(chunk)
+                original += len(chunk)
+                compressed += len(data)
+                if data:
+                    yield data
+            data = stream.finish()
+            compressed += len(data)
+            yield data
+            self.stats.record(encoding, original, compressed)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
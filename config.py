@@ -1,14 +1,133 @@
 import os
-SECRET_KEY = os.urandom(32)
+# Must be the same in every worker, or sessions and flash messages set by one
+# worker are rejected by the next. create_app refuses to start without it
+# unless DEBUG is on, and then uses a random key that lasts one process.
+SECRET_KEY = os.environ.get('SECRET_KEY')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Debug mode, off unless FLASK_DEBUG=1.
+DEBUG = os.environ.get('FLASK_DEBUG', '0') == '1'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
 # Connect to the database
 
 
 # TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://siva@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://siva@localhost:5432/fyyur')
+
+# Connection pool, per worker process. Size it from /pool/stats: a pool that
+# often hits max overflow or shows checkout waits is too small.
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+# Seconds to wait for a free connection before giving up.
+DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT', 30))
+# Replace connections older than this many seconds; -1 keeps them forever.
+DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+DATABASE_POOL_PRE_PING = os.environ.get('DATABASE_POOL_PRE_PING', '1') == '1'
+# Milliseconds before Postgres cancels a statement; 0 disables the limit.
+DATABASE_STATEMENT_TIMEOUT = int(os.environ.get('DATABASE_STATEMENT_TIMEOUT', 5000))
+# Set when connecting through PgBouncer in transaction pooling mode. The app
+# then keeps no pool of its own and scopes the statement timeout per transaction.
+DATABASE_PGBOUNCER = os.environ.get('DATABASE_PGBOUNCER', '0') == '1'
+
+# Read replica for GET requests, with the same pool settings as the primary.
+# Reads fall back to the primary while the replica lags more than
+# REPLICA_MAX_LAG seconds (checked every REPLICA_LAG_CHECK_INTERVAL seconds),
+# and for REPLICA_STICKY_SECONDS after a browser's own write. Leave
+# DATABASE_REPLICA_URL unset to send everything to the primary.
+SQLALCHEMY_BINDS = {'replica': os.environ['DATABASE_REPLICA_URL']} if os.environ.get('DATABASE_REPLICA_URL') else {}
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 5))
+REPLICA_LAG_CHECK_INTERVAL = 2
+REPLICA_STICKY_SECONDS = 10
+# Send an X-DB-Role header naming the database that served the request's reads.
+REPLICA_ROLE_HEADER = DEBUG
+
+# Number of rows per page on the /venues, /artists and /shows listings.
+# A request may ask for fewer or more with ?limit=, up to MAX_PAGE_SIZE.
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Name search on venues and artists. Results below the pg_trgm similarity
+# threshold (0..1) are dropped unless the name contains the search term.
+SEARCH_RESULT_LIMIT = 50
+SEARCH_SIMILARITY_THRESHOLD = 0.3
+
+# Most venues listed by one availability search.
+AVAILABILITY_RESULT_LIMIT = 100
+
+# Offline gazetteer files for venue and artist coordinates: US Census
+# Gazetteer places and ZCTA files, or CSVs with city, state (or zip),
+# latitude and longitude columns. Fill in existing rows with 'flask geocode'.
+GAZETTEER_PATH = os.environ.get('GAZETTEER_PATH')
+GAZETTEER_ZIP_PATH = os.environ.get('GAZETTEER_ZIP_PATH')
+# Radius in miles of ?near= searches without ?within=, and the largest allowed.
+NEAR_DEFAULT_MILES = 25
+NEAR_MAX_MILES = 500
+# Nearest venues shown on a ?near= venue listing, and the most
+# /api/v1/{venues,artists}/near returns with ?limit=.
+NEAREST_DEFAULT_LIMIT = 10
+NEAREST_MAX_LIMIT = 100
+
+# Number of formatted show times memoized by the datetime template filter.
+DATETIME_FORMAT_CACHE_SIZE = 4096
+
+# In-process cache of rendered venue, artist and show pages. Entries are
+# dropped on writes to the rows they show and otherwise expire after
+# RESPONSE_CACHE_TTL seconds, which also bounds staleness across workers.
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_MAX_ENTRIES = 2048
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_TTL = 60
+
+# Stream the whole /shows history from a server-side cursor instead of
+# rendering it a page at a time, fetching SHOWS_STREAM_BATCH_SIZE rows per batch.
+SHOWS_STREAMING = False
+SHOWS_STREAM_BATCH_SIZE = 500
+
+# Most shows accepted by one POST /api/v1/shows request.
+SHOW_BULK_MAX = 1000
+
+# Per-request SQL instrumentation. Requests spending more than
+# SLOW_REQUEST_DB_MS in the database or running more than
+# SLOW_REQUEST_STATEMENTS statements are logged to SLOW_QUERY_LOG with their
+# SQL_STATS_SLOWEST slowest statements, and a statement repeated more than
+# N_PLUS_ONE_THRESHOLD times in one request is logged as a likely N+1.
+SQL_STATS_ENABLED = True
+SQL_STATS_SLOWEST = 5
+SLOW_REQUEST_DB_MS = 200
+SLOW_REQUEST_STATEMENTS = 20
+N_PLUS_ONE_THRESHOLD = 5
+SLOW_QUERY_LOG = 'slow_queries.log'
+# Send an X-DB-Stats header with the statement count and database time.
+SQL_STATS_HEADER = DEBUG
+
+# Upcoming show counts on the venue list and search pages come from
+# materialized views refreshed in the background, and may be up to this many
+# seconds stale. Without the background refresh, run 'flask refresh-counts'
+# from cron instead.
+UPCOMING_COUNTS_REFRESH = True
+UPCOMING_COUNTS_MAX_STALENESS = 60
+
+# show is partitioned by month of start_time. Workers check every
+# SHOW_PARTITION_CHECK_INTERVAL seconds that SHOW_PARTITIONS_AHEAD months of
+# partitions exist, and detach partitions older than
+# SHOW_PARTITION_RETENTION_MONTHS when it is set. Detached partitions are kept
+# as plain tables for archiving.
+SHOW_PARTITION_MAINTENANCE = True
+SHOW_PARTITION_CHECK_INTERVAL = 3600
+SHOW_PARTITIONS_AHEAD = 12
+SHOW_PARTITION_RETENTION_MONTHS = None
+
+# Lifetime in seconds of the immutable Cache-Control sent with fingerprinted
+# files under /static/dist; build them with 'flask build-assets'.
+ASSETS_MAX_AGE = 31536000
+
+# Dynamic brotli/gzip compression of rendered responses. Bodies under
+# COMPRESS_MIN_SIZE bytes are not worth the CPU; brotli is used when the
+# brotli package is installed and the client accepts it.
+COMPRESS_ENABLED = True
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MIMETYPES = ['text/html', 'application/json', 'text/css', 'application/javascript', 'text/plain', 'image/svg+xml']
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_BROTLI_LEVEL = 4
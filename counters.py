@@ -0,0 +1,63 @@
+from sqlalchemy import text
+from sqlalchemy.sql import column, table
+
+from tasks import PeriodicTask
+
+
+# Materialized counters.
+#
+# venue_upcoming_shows and artist_upcoming_shows are materialized views of
+# the number of shows after LOCALTIMESTAMP per venue and per artist. Each
+# REFRESH re-evaluates the cutoff, so shows roll from upcoming to past on
+# refresh as well as new shows being counted. venue_facets and artist_facets
+# hold the unfiltered facet counts of the browse pages (per genre, per state,
+# the total and how many are seeking), which would otherwise mean counting
+# the whole table on every visit. A background thread in every worker wakes
+# every half of UPCOMING_COUNTS_MAX_STALENESS seconds and, under an advisory
+# lock so only one worker does the work, refreshes all the views CONCURRENTLY
+# (readers are never blocked) once they are that old. Counts are therefore at
+# most about UPCOMING_COUNTS_MAX_STALENESS seconds stale.
+
+venue_upcoming_shows = table('venue_upcoming_shows', column('venue_id'), column('num_upcoming_shows'))
+artist_upcoming_shows = table('artist_upcoming_shows', column('artist_id'), column('num_upcoming_shows'))
+venue_facets = table('venue_facets', column('facet'), column('value'), column('count'))
+artist_facets = table('artist_facets', column('facet'), column('value'), column('count'))
+
+COUNTER_VIEWS = [venue_upcoming_shows, artist_upcoming_shows, venue_facets, artist_facets]
+
+# Arbitrary application-wide key for pg_try_advisory_xact_lock.
+REFRESH_LOCK_KEY = 461207
+
+
+def refresh_upcoming_counts(engine, max_age=0):
+    # Refresh the views if they are at least max_age seconds old and no other
+    # process is refreshing them. Returns True if this call refreshed them.
+    with engine.begin() as connection:
+        locked = connection.execute(text('SELECT pg_try_advisory_xact_lock(:key)'), {"key": REFRESH_LOCK_KEY}).scalar()
+        if not locked:
+            return False
+        age = connection.execute(text(
+            "SELECT extract(epoch FROM clock_timestamp() - refreshed_at) FROM counter_refresh WHERE name = 'upcoming_shows'"
+        )).scalar()
+        if age is not None and age < max_age:
+            return False
+        for view in COUNTER_VIEWS:
+            connection.execute(text(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {view.name}'))
+        connection.execute(text(
+            "UPDATE counter_refresh SET refreshed_at = clock_timestamp() WHERE name = 'upcoming_shows'"
+        ))
+    return True
+
+
+class UpcomingCountRefresher(PeriodicTask):
+
+    name = 'upcoming-count-refresher'
+
+    def enabled(self, config):
+        return config['UPCOMING_COUNTS_REFRESH']
+
+    def interval(self, config):
+        return config['UPCOMING_COUNTS_MAX_STALENESS'] / 2.0
+
+    def run_once(self, engine):
+        refresh_upcoming_counts(engine, self.interval(self.app.config))
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+from sqlalchemy import event, text
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+# Connection pool settings and live statistics.
+#
+# Direct connections use InstrumentedQueuePool, a QueuePool that also records
+# how long each checkout waited for a free connection. Behind PgBouncer in
+# transaction pooling mode the app keeps no pool of its own (NullPool) and
+# leaves pooling to PgBouncer.
+
+class WaitStats(object):
+
+    def __init__(self, samples=1024):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=samples)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            return {
+                "checkouts": self.count,
+                "wait_total_ms": self.total * 1000,
+                "wait_avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+                "wait_p95_ms": samples[int(len(samples) * 0.95)] * 1000 if samples else 0.0,
+                "wait_max_ms": self.max * 1000
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+
+    def __init__(self, *args, **kwargs):
+        super(InstrumentedQueuePool, self).__init__(*args, **kwargs)
+        self.wait_stats = WaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super(InstrumentedQueuePool, self)._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
+def engine_options(config):
+    # SQLALCHEMY_ENGINE_OPTIONS built from the DATABASE_* settings.
+    if config['DATABASE_PGBOUNCER']:
+        # PgBouncer rejects the startup 'options' parameter, so the statement
+        # timeout is applied per transaction instead (see apply_statement_timeout).
+        return {"poolclass": NullPool}
+
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": config['DATABASE_POOL_SIZE'],
+        "max_overflow": config['DATABASE_MAX_OVERFLOW'],
+        "pool_timeout": config['DATABASE_POOL_TIMEOUT'],
+        "pool_recycle": config['DATABASE_POOL_RECYCLE'],
+        "pool_pre_ping": config['DATABASE_POOL_PRE_PING']
+    }
+    if config['DATABASE_STATEMENT_TIMEOUT']:
+        options["connect_args"] = {"options": f"-c statement_timeout={config['DATABASE_STATEMENT_TIMEOUT']}"}
+    return options
+
+
+def async_engine_options(config):
+    # create_async_engine options for the asyncpg driver used by asgi.py,
+    # built from the same DATABASE_* settings as engine_options.
+    if config['DATABASE_PGBOUNCER']:
+        # Transaction pooling cannot keep asyncpg's prepared statements, and
+        # PgBouncer rejects startup settings, so the statement timeout has to
+        # come from the database role (ALTER ROLE ... SET statement_timeout).
+        return {
+            "poolclass": NullPool,
+            "connect_args": {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        }
+
+    options = {
+        "pool_size": config['DATABASE_POOL_SIZE'],
+        "max_overflow": config['DATABASE_MAX_OVERFLOW'],
+        "pool_timeout": config['DATABASE_POOL_TIMEOUT'],
+        "pool_recycle": config['DATABASE_POOL_RECYCLE'],
+        "pool_pre_ping": config['DATABASE_POOL_PRE_PING']
+    }
+    if config['DATABASE_STATEMENT_TIMEOUT']:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(config['DATABASE_STATEMENT_TIMEOUT'])}}
+    return options
+
+
+def apply_statement_timeout(connection, timeout):
+    # SET LOCAL equivalent, scoped to the current transaction so it never leaks
+    # to another client sharing the PgBouncer server connection.
+    connection.execute(text("SELECT set_config('statement_timeout', :timeout, true)"), {"timeout": str(int(timeout))})
+
+
+# Engines whose statement timeout is set per transaction, with the timeout.
+# A single session listener serves them all, so building several apps in one
+# process neither stacks listeners nor applies one app's timeout to another's
+# connections.
+transaction_timeouts = weakref.WeakKeyDictionary()
+
+
+def statement_timeout_per_transaction(session_class, engine, timeout):
+    transaction_timeouts[engine] = timeout
+    if not event.contains(session_class, 'after_begin', apply_transaction_timeout):
+        event.listen(session_class, 'after_begin', apply_transaction_timeout)
+
+
+def apply_transaction_timeout(session, transaction, connection):
+    timeout = transaction_timeouts.get(connection.engine)
+    if timeout:
+        apply_statement_timeout(connection, timeout)
+
+
+def dispose_after_fork(engine):
+    # A forked worker inherits the parent's pooled connections, and two
+    # processes talking over one socket corrupt both sessions. The child drops
+    # its copy of the pool without closing the parent's sockets and opens its
+    # own connections.
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+def pool_stats(engine):
+    # Live counts for this worker's pool. Each worker process has its own pool,
+    # so the pid tells workers apart when sampling behind a load balancer.
+    pool = engine.pool
+    stats = {"pid": os.getpid(), "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.wait_stats.snapshot())
+    return stats
@@ -13,6 +13,18 @@ def test():
         abort("Aborted at user request.")
 
 
+def bench(database_url, scales="tiny,small"):
+    # Seeds database_url, so point it at a throwaway database.
+    local(
+        "python -m benchmarks.run run --database-url {} --scales {}".format(database_url, scales)
+    )
+
+
+def build_assets():
+    # Run before starting or deploying the app; templates link to the bundles.
+    local("flask build-assets")
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
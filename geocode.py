@@ -0,0 +1,191 @@
+import csv
+import re
+import threading
+
+from sqlalchemy import text
+
+
+# Offline geocoding from gazetteer files.
+#
+# Coordinates come from files on disk, never from a network service: the US
+# Census Bureau's Gazetteer files (tab separated; the places file for cities,
+# the ZCTA file for ZIP codes) or any CSV/TSV with city, state, latitude and
+# longitude columns (or zip, latitude and longitude). A venue is placed at the
+# ZIP code in its address when there is one, otherwise at the centre of its
+# city; artists only have a city. 'flask geocode' fills in the coordinates of
+# every row that has none, and new or edited venues and artists are placed as
+# they are saved when GAZETTEER_PATH or GAZETTEER_ZIP_PATH is set.
+
+ZIP_PATTERN = re.compile(r'\b(\d{5})(?:-\d{4})?\s*$')
+QUERY_ZIP_PATTERN = re.compile(r'^\s*(\d{5})(?:-\d{4})?\s*$')
+QUERY_PLACE_PATTERN = re.compile(r'^\s*(.+?)[,\s]\s*([A-Za-z]{2})\s*$')
+# Census place names end with their legal description, e.g. 'Austin city' or
+# 'Indianapolis city (balance)'.
+PLACE_SUFFIX = re.compile(
+    r'\s+(city and borough|city|town|township|village|borough|municipality|cdp|'
+    r'(consolidated|metropolitan|metro|unified) government|urban county)(\s+\(balance\))?$'
+)
+ABBREVIATIONS = [(re.compile(r'^st\.?\s+'), 'saint '), (re.compile(r'^ft\.?\s+'), 'fort '),
+    (re.compile(r'^mt\.?\s+'), 'mount ')]
+
+COLUMNS = {
+    'latitude': ('INTPTLAT', 'latitude', 'lat'),
+    'longitude': ('INTPTLONG', 'longitude', 'lng', 'lon'),
+    'city': ('NAME', 'city'),
+    'state': ('USPS', 'state'),
+    'zip': ('GEOID', 'zip', 'zipcode', 'postal_code'),
+}
+
+
+def place_key(city, state):
+    name = ' '.join(city.lower().replace('(balance)', '').split())
+    for pattern, replacement in ABBREVIATIONS:
+        name = pattern.sub(replacement, name)
+    return name, state.strip().upper()
+
+
+class Gazetteer(object):
+
+    def __init__(self):
+        self.places = {}
+        self.aliases = {}
+        self.zips = {}
+
+    def load(self, path):
+        # Add every place or ZIP code in path and return how many were read.
+        with open(path, newline='', encoding='utf-8-sig') as gazetteerFile:
+            sample = gazetteerFile.readline()
+            gazetteerFile.seek(0)
+            reader = csv.reader(gazetteerFile, delimiter='\t' if '\t' in sample else ',')
+            header = [name.strip().lower() for name in next(reader)]
+            columns = {}
+            for column, names in COLUMNS.items():
+                for name in names:
+                    if name.lower() in header:
+                        columns[column] = header.index(name.lower())
+                        break
+            if 'latitude' not in columns or 'longitude' not in columns:
+                raise ValueError(f'{path} has no latitude/longitude columns')
+            isPlaces = 'city' in columns and 'state' in columns
+            if not isPlaces and 'zip' not in columns:
+                raise ValueError(f'{path} has neither city and state nor zip columns')
+
+            count = 0
+            for row in reader:
+                if not row:
+                    continue
+                location = (float(row[columns['latitude']]), float(row[columns['longitude']]))
+                if isPlaces:
+                    self.add_place(row[columns['city']], row[columns['state']], location)
+                else:
+                    self.zips.setdefault(row[columns['zip']].strip()[:5], location)
+                count += 1
+        return count
+
+    def add_place(self, name, state, location):
+        name, state = place_key(name, state)
+        name = PLACE_SUFFIX.sub('', name)
+        self.places.setdefault((name, state), location)
+        # 'Nashville-Davidson' and 'Louisville/Jefferson County' are also
+        # found as Nashville and Louisville, unless a place has that name.
+        alias = re.split(r'[-/]', name)[0].strip()
+        if alias != name:
+            self.aliases.setdefault((alias, state), location)
+
+    def locate(self, city, state, address=None):
+        # (latitude, longitude) or None.
+        match = ZIP_PATTERN.search(address or '')
+        if match and match.group(1) in self.zips:
+            return self.zips[match.group(1)]
+        if not city or not state:
+            return None
+        key = place_key(city, state)
+        return self.places.get(key) or self.aliases.get(key)
+
+    def locate_query(self, query):
+        # A place typed by a user: a ZIP code, or a city and state such as
+        # 'Austin, TX'.
+        match = QUERY_ZIP_PATTERN.match(query or '')
+        if match:
+            return self.zips.get(match.group(1))
+        match = QUERY_PLACE_PATTERN.match(query or '')
+        if match:
+            return self.locate(match.group(1), match.group(2))
+        return None
+
+
+class Geocoder(object):
+    # The configured gazetteer, loaded on first use (or by warm_up when
+    # preloading), so workers that never geocode do not read the files.
+
+    def __init__(self, app=None):
+        self._gazetteer = None
+        self._lock = threading.Lock()
+        self.paths = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.paths = [path for path in (app.config['GAZETTEER_PATH'], app.config['GAZETTEER_ZIP_PATH']) if path]
+
+    @property
+    def gazetteer(self):
+        if self._gazetteer is None:
+            with self._lock:
+                if self._gazetteer is None:
+                    gazetteer = Gazetteer()
+                    for path in self.paths:
+                        gazetteer.load(path)
+                    self._gazetteer = gazetteer
+        return self._gazetteer
+
+    def locate(self, city, state, address=None):
+        if not self.paths:
+            return None
+        return self.gazetteer.locate(city, state, address)
+
+    def locate_query(self, query):
+        if not self.paths:
+            return None
+        return self.gazetteer.locate_query(query)
+
+
+UPDATE_LOCATIONS = (
+    'UPDATE {table} SET latitude = located.latitude, longitude = located.longitude '
+    'FROM unnest(CAST(:ids AS integer[]), CAST(:latitudes AS double precision[]), '
+    'CAST(:longitudes AS double precision[])) AS located (id, latitude, longitude) '
+    'WHERE {table}.id = located.id'
+)
+
+
+def geocode_table(engine, table, gazetteer, everything=False, batch_size=5000):
+    # Place the rows of table ('venue' or 'artist') that have no coordinates,
+    # or all of them, in one transaction. Coordinates are derived data, so
+    # version and updated_at are left alone. Returns (located, unmatched),
+    # unmatched counting rows per (city, state) that could not be placed.
+    address = 'address' if table == 'venue' else 'NULL'
+    where = '' if everything else ' WHERE latitude IS NULL'
+    located, unmatched = 0, {}
+    with engine.begin() as connection:
+        rows = connection.execute(text(f'SELECT id, city, state, {address} FROM {table}{where}')).all()
+        batch = ([], [], [])
+        for rowId, city, state, rowAddress in rows:
+            location = gazetteer.locate(city, state, rowAddress)
+            if location is None:
+                unmatched[(city, state)] = unmatched.get((city, state), 0) + 1
+                continue
+            batch[0].append(rowId)
+            batch[1].append(location[0])
+            batch[2].append(location[1])
+            if len(batch[0]) >= batch_size:
+                located += update_locations(connection, table, batch)
+                batch = ([], [], [])
+        if batch[0]:
+            located += update_locations(connection, table, batch)
+    return located, unmatched
+
+
+def update_locations(connection, table, batch):
+    ids, latitudes, longitudes = batch
+    connection.execute(text(UPDATE_LOCATIONS.format(table=table)), {"ids": ids, "latitudes": latitudes, "longitudes": longitudes})
+    return len(ids)
@@ -0,0 +1,11 @@
+import os
+
+# gunicorn -c gunicorn.conf.py
+#
+# The app is built and warmed up once in the master (create_app(preload=True))
+# and forked into the workers, which share its memory copy-on-write.
+
+wsgi_app = 'app:create_app(preload=True)'
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+bind = os.environ.get('BIND', '0.0.0.0:' + os.environ.get('PORT', '5000'))
@@ -0,0 +1,287 @@
+import csv
+import json
+import os
+import tempfile
+
+
+# Bulk catalog import through PostgreSQL COPY.
+#
+# Each file is copied into a temporary staging table of text columns, checked
+# with set-based SQL (bad rows go to a per-file error report instead of
+# aborting the load) and merged into the real table in one INSERT ... SELECT.
+# Venues and artists are deduplicated on their unique names; shows refer to
+# their artist and venue by name and are deduplicated on (artist_id, venue_id,
+# start_time); a show overlapping one already at its venue, or another show
+# for its venue in the same file, is rejected.
+# Genres are ';' separated in CSV files and JSON arrays in NDJSON files.
+
+ENTITIES = {
+    'venue': {
+        'required': ['name', 'city', 'state', 'address', 'phone', 'genres'],
+        'optional': ['image_link', 'facebook_link', 'website', 'seeking_talent', 'seeking_description'],
+        'booleans': ['seeking_talent'],
+    },
+    'artist': {
+        'required': ['name', 'city', 'state', 'genres'],
+        'optional': ['phone', 'image_link', 'facebook_link', 'website', 'seeking_venue', 'seeking_description'],
+        'booleans': ['seeking_venue'],
+    },
+    'show': {
+        'required': ['artist_name', 'venue_name', 'start_time'],
+        'optional': [],
+        'booleans': [],
+    },
+}
+
+TRUE_VALUES = ('t', 'true', 'y', 'yes', '1', 'on')
+FALSE_VALUES = ('f', 'false', 'n', 'no', '0', 'off')
+TIMESTAMP_PATTERN = r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$'
+
+
+class CatalogImportError(Exception):
+    pass
+
+
+def import_file(connection, entity, path, update_existing=False):
+    # Load one CSV or NDJSON file for entity ('venue', 'artist' or 'show') in
+    # its own transaction on a raw DB-API connection. Returns a report dict;
+    # rejected rows are also written to <path>.errors.csv.
+    spec = ENTITIES[entity]
+    columns = spec['required'] + spec['optional']
+    report = {
+        "entity": entity, "path": path, "rows": 0, "inserted": 0, "updated": 0,
+        "skipped": 0, "errors": 0, "error_report": None, "failed": None
+    }
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SET LOCAL synchronous_commit = off')
+        cursor.execute(
+            'CREATE TEMP TABLE import_stage (source_row bigserial, '
+            + ', '.join(f'{column} text' for column in columns)
+            + ') ON COMMIT DROP'
+        )
+        unreadable = copy_into_stage(cursor, spec, path)
+        cursor.execute('ANALYZE import_stage')
+        cursor.execute('SELECT count(*) FROM import_stage')
+        report['rows'] = cursor.fetchone()[0] + len(unreadable)
+
+        cursor.execute(
+            'CREATE TEMP TABLE import_error ON COMMIT DROP AS '
+            'SELECT source_row, reason FROM (' + validation_sql(entity, spec) + ') checked '
+            'WHERE reason IS NOT NULL'
+        )
+        cursor.execute('SELECT source_row, reason FROM import_error ORDER BY source_row')
+        errors = sorted(unreadable + cursor.fetchall())
+
+        cursor.execute(merge_sql(entity, spec, update_existing))
+        report['inserted'], report['updated'] = cursor.fetchone()
+        connection.commit()
+    except Exception as exc:
+        connection.rollback()
+        report['failed'] = str(exc).strip()
+        return report
+    finally:
+        cursor.close()
+
+    report['errors'] = len(errors)
+    report['skipped'] = report['rows'] - report['errors'] - report['inserted'] - report['updated']
+    if errors:
+        report['error_report'] = path + '.errors.csv'
+        with open(report['error_report'], 'w', newline='') as errorFile:
+            writer = csv.writer(errorFile)
+            writer.writerow(['row', 'reason'])
+            writer.writerows(errors)
+    return report
+
+
+def copy_into_stage(cursor, spec, path):
+    # Returns (row, reason) pairs for rows that could not be staged at all.
+    unreadable = []
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        with open(path, newline='') as source:
+            header = next(csv.reader(source), [])
+            stageColumns = check_columns(spec, header)
+            source.seek(0)
+            cursor.copy_expert(
+                f"COPY import_stage ({', '.join(stageColumns)}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+                source
+            )
+    elif extension in ('.ndjson', '.jsonl'):
+        columns = spec['required'] + spec['optional']
+        # COPY cannot skip malformed JSON lines, so NDJSON is re-encoded as CSV
+        # with its source line numbers and bad lines are reported here.
+        with open(path) as source, tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024, mode='w+', newline='') as buffer:
+            writer = csv.writer(buffer)
+            for lineNumber, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    document = json.loads(line)
+                except ValueError:
+                    document = None
+                if not isinstance(document, dict):
+                    unreadable.append((lineNumber, 'line is not a JSON object'))
+                    continue
+                writer.writerow([lineNumber] + [csv_value(column, document.get(column)) for column in columns])
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY import_stage (source_row, {', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+    else:
+        raise CatalogImportError(f'Unsupported file type {extension!r}; expected .csv, .ndjson or .jsonl.')
+    return unreadable
+
+
+def check_columns(spec, header):
+    header = [column.strip() for column in header]
+    unknown = [column for column in header if column not in spec['required'] + spec['optional']]
+    missing = [column for column in spec['required'] if column not in header]
+    if unknown or missing:
+        raise CatalogImportError(f'Bad header: unknown columns {unknown}, missing columns {missing}.')
+    return header
+
+
+def csv_value(column, value):
+    if value is None:
+        return None
+    if column == 'genres' and isinstance(value, list):
+        return ';'.join(str(genre) for genre in value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def quoted(values):
+    return ', '.join(f"'{value}'" for value in values)
+
+
+def validation_sql(entity, spec):
+    # One CASE per row yields the first problem found, or NULL if the row is valid.
+    checks = [f"WHEN nullif(trim(s.{column}), '') IS NULL THEN '{column} is required'" for column in spec['required']]
+    for column in spec['booleans']:
+        checks.append(
+            f"WHEN nullif(trim(s.{column}), '') IS NOT NULL AND lower(trim(s.{column})) NOT IN "
+            f"({quoted(TRUE_VALUES + FALSE_VALUES)}) THEN '{column} is not a boolean'"
+        )
+    if entity == 'show':
+        checks.append(f"WHEN {staged_start_time('s')} IS NULL THEN 'start_time is not a timestamp'")
+        checks.append("WHEN a.id IS NULL THEN 'unknown artist ' || quote_literal(trim(s.artist_name))")
+        checks.append("WHEN v.id IS NULL THEN 'unknown venue ' || quote_literal(trim(s.venue_name))")
+        # Imported shows take the default two hour duration.
+        startTime = staged_start_time('s')
+        checks.append(
+            "WHEN EXISTS (SELECT 1 FROM show x WHERE x.venue_id = v.id "
+            f"AND x.start_time > {startTime} - interval '24 hours' "
+            f"AND x.start_time < {startTime} + interval '2 hours' "
+            f"AND x.start_time + x.duration > {startTime} "
+            f"AND (x.artist_id, x.start_time) <> (a.id, {startTime})) "
+            "THEN 'overlaps another show at venue ' || quote_literal(trim(s.venue_name))"
+        )
+        checks.append(
+            "WHEN clash.venue_name IS NOT NULL "
+            "THEN 'overlaps another show in this file at venue ' || quote_literal(trim(s.venue_name))"
+        )
+        return (
+            'SELECT s.source_row, CASE ' + ' '.join(checks) + ' END AS reason FROM import_stage s '
+            'LEFT JOIN artist a ON a.name = trim(s.artist_name) '
+            'LEFT JOIN venue v ON v.name = trim(s.venue_name) '
+            f'LEFT JOIN ({file_overlaps_sql()}) clash ON clash.venue_name = trim(s.venue_name) '
+            f"AND clash.artist_name = trim(s.artist_name) AND clash.start_time = {staged_start_time('s')}"
+        )
+    return 'SELECT s.source_row, CASE ' + ' '.join(checks) + ' END AS reason FROM import_stage s'
+
+
+def staged_start_time(alias):
+    # start_time as a timestamp, or NULL when it is not one. Every cast goes
+    # through here, since one failed cast anywhere in a statement would abort
+    # the whole file: the pattern rejects other formats and special values
+    # such as 'now', and try_timestamp() (migration a1d4f6c9e823) returns NULL
+    # for impossible dates and times such as 2026-02-30 or 25:99.
+    return (
+        f"CASE WHEN trim({alias}.start_time) ~ '{TIMESTAMP_PATTERN}' "
+        f"THEN try_timestamp(trim({alias}.start_time)) END"
+    )
+
+
+def file_overlaps_sql():
+    # The distinct (venue, artist, start) shows of the file that overlap
+    # another one for the same venue; every show involved is rejected, since
+    # which to keep is not ours to guess. All imported shows last two hours,
+    # so a show overlaps some other show exactly when it overlaps its
+    # neighbour in start time order, and one window pass finds them all.
+    return (
+        'SELECT venue_name, artist_name, start_time FROM ('
+        'SELECT venue_name, artist_name, start_time, '
+        'lag(start_time) OVER w AS previous_start, lead(start_time) OVER w AS next_start FROM ('
+        'SELECT DISTINCT trim(o.venue_name) AS venue_name, trim(o.artist_name) AS artist_name, '
+        f"{staged_start_time('o')} AS start_time FROM import_stage o"
+        ') shows WHERE start_time IS NOT NULL '
+        'WINDOW w AS (PARTITION BY venue_name ORDER BY start_time, artist_name)'
+        ') neighbours '
+        "WHERE previous_start > start_time - interval '2 hours' OR next_start < start_time + interval '2 hours'"
+    )
+
+
+def column_expression(spec, column):
+    if column == 'genres':
+        return "ARRAY(SELECT trim(genre) FROM unnest(string_to_array(s.genres, ';')) genre WHERE trim(genre) <> '')"
+    if column in spec['booleans']:
+        # Missing values take the model default of true.
+        return f"coalesce(lower(trim(s.{column})) NOT IN ({quoted(FALSE_VALUES)}), true)"
+    return f"nullif(trim(s.{column}), '')"
+
+
+def merge_sql(entity, spec, update_existing):
+    # Insert valid staged rows, keeping the last occurrence of each key in the
+    # file. RETURNING (xmax = 0) tells fresh inserts apart from updates.
+    valid = 'NOT EXISTS (SELECT 1 FROM import_error e WHERE e.source_row = s.source_row)'
+    if entity == 'show':
+        target = 'show'
+        columns = ['artist_id', 'venue_id', 'start_time']
+        startTime = staged_start_time('s')
+        select = (
+            f'SELECT DISTINCT ON (a.id, v.id, {startTime}) a.id, v.id, {startTime} '
+            'FROM import_stage s '
+            'JOIN artist a ON a.name = trim(s.artist_name) '
+            'JOIN venue v ON v.name = trim(s.venue_name) '
+            f'WHERE {valid} ORDER BY a.id, v.id, {startTime}, s.source_row DESC'
+        )
+        conflict = '(artist_id, venue_id, start_time)'
+        updates = []
+    else:
+        target = entity
+        columns = spec['required'] + spec['optional']
+        select = (
+            'SELECT DISTINCT ON (trim(s.name)) '
+            + ', '.join(column_expression(spec, column) for column in columns)
+            + f' FROM import_stage s WHERE {valid} ORDER BY trim(s.name), s.source_row DESC'
+        )
+        conflict = '(name)'
+        updates = [column for column in columns if column != 'name']
+
+    if update_existing:
+        assignments = [f'{column} = EXCLUDED.{column}' for column in updates]
+        assignments += ["updated_at = timezone('utc', now())", f'version = {target}.version + 1']
+        action = 'DO UPDATE SET ' + ', '.join(assignments)
+    else:
+        action = 'DO NOTHING'
+
+    return (
+        f'WITH merged AS (INSERT INTO {target} ({", ".join(columns)}) {select} '
+        f'ON CONFLICT {conflict} {action} RETURNING (xmax = 0) AS inserted) '
+        'SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged'
+    )
+
+
+def format_report(report):
+    if report['failed']:
+        return f"{report['path']}: import of {report['entity']} rows failed: {report['failed']}"
+    summary = (
+        f"{report['path']}: {report['rows']} {report['entity']} rows, {report['inserted']} inserted, "
+        f"{report['updated']} updated, {report['skipped']} skipped as duplicates, {report['errors']} rejected"
+    )
+    if report['error_report']:
+        summary += f" (see {report['error_report']})"
+    return summary
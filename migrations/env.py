@@ -1,6 +1,7 @@
 from __future__ import with_statement
 
 import logging
+import re
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -78,11 +79,19 @@ def run_migrations_online():
         poolclass=pool.NullPool,
     )
 
+    # Tables created by hand-written migrations with no model, and the
+    # partitions of show; keep autogenerate from proposing to drop them.
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ != 'table' or not reflected:
+            return True
+        return name != 'counter_refresh' and not re.match(r'^show_(default|\d{4}_\d{2})$', name)
+
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
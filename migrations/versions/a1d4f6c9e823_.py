@@ -0,0 +1,39 @@
+"""add try_timestamp() for validating imported show times
+
+Revision ID: a1d4f6c9e823
+Revises: f3c1a8e2b705
+Create Date: 2026-10-17 19:40:12.306518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d4f6c9e823'
+down_revision = 'f3c1a8e2b705'
+branch_labels = None
+depends_on = None
+
+
+# A cast that returns NULL instead of raising, so the importer can report an
+# impossible date (2026-02-30, 25:99) as a bad row rather than abort the file.
+# STABLE, not IMMUTABLE, since parsing depends on the DateStyle setting.
+TRY_TIMESTAMP = """
+CREATE FUNCTION try_timestamp(value text) RETURNS timestamp
+LANGUAGE plpgsql STABLE AS $$
+BEGIN
+  RETURN value::timestamp;
+EXCEPTION WHEN invalid_datetime_format OR datetime_field_overflow THEN
+  RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade():
+    op.execute(TRY_TIMESTAMP)
+
+
+def downgrade():
+    op.execute('DROP FUNCTION try_timestamp(text)')
@@ -0,0 +1,166 @@
+"""add show duration and reject overlapping shows at a venue
+
+Revision ID: a9c4e1f7b352
+Revises: f2a8c4e7b190
+Create Date: 2026-10-17 15:02:37.518406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e1f7b352'
+down_revision = 'f2a8c4e7b190'
+branch_labels = None
+depends_on = None
+
+
+# Exclusion constraints cannot be declared on the partitioned show table (they
+# would have to compare start_time for equality), so every partition carries
+# its own. New partitions get theirs from create_show_partitions.
+NO_OVERLAP = 'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, start_time + duration) WITH &&)'
+
+CREATE_SHOW_PARTITIONS = """
+CREATE OR REPLACE FUNCTION create_show_partitions(first_month date, last_month date) RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+  month date;
+  next_month date;
+  partition text;
+  created integer := 0;
+BEGIN
+  FOR month IN
+    SELECT generate_series(date_trunc('month', first_month), date_trunc('month', last_month), interval '1 month')::date
+  LOOP
+    partition := 'show_' || to_char(month, 'YYYY_MM');
+    CONTINUE WHEN to_regclass(partition) IS NOT NULL;
+    next_month := (month + interval '1 month')::date;
+    IF EXISTS (SELECT 1 FROM show_default WHERE start_time >= month AND start_time < next_month) THEN
+      ALTER TABLE show DETACH PARTITION show_default;
+      EXECUTE format('CREATE TABLE %I PARTITION OF show FOR VALUES FROM (%L) TO (%L)', partition, month, next_month);
+      EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I """ + NO_OVERLAP + """', partition, partition || '_no_overlap');
+      EXECUTE format('INSERT INTO %I SELECT * FROM show_default WHERE start_time >= %L AND start_time < %L',
+        partition, month, next_month);
+      DELETE FROM show_default WHERE start_time >= month AND start_time < next_month;
+      ALTER TABLE show ATTACH PARTITION show_default DEFAULT;
+    ELSE
+      EXECUTE format('CREATE TABLE %I PARTITION OF show FOR VALUES FROM (%L) TO (%L)', partition, month, next_month);
+      EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I """ + NO_OVERLAP + """', partition, partition || '_no_overlap');
+    END IF;
+    created := created + 1;
+  END LOOP;
+  RETURN created;
+END
+$$
+"""
+
+PREVIOUS_CREATE_SHOW_PARTITIONS = """
+CREATE OR REPLACE FUNCTION create_show_partitions(first_month date, last_month date) RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+  month date;
+  next_month date;
+  partition text;
+  created integer := 0;
+BEGIN
+  FOR month IN
+    SELECT generate_series(date_trunc('month', first_month), date_trunc('month', last_month), interval '1 month')::date
+  LOOP
+    partition := 'show_' || to_char(month, 'YYYY_MM');
+    CONTINUE WHEN to_regclass(partition) IS NOT NULL;
+    next_month := (month + interval '1 month')::date;
+    IF EXISTS (SELECT 1 FROM show_default WHERE start_time >= month AND start_time < next_month) THEN
+      ALTER TABLE show DETACH PARTITION show_default;
+      EXECUTE format('CREATE TABLE %I PARTITION OF show FOR VALUES FROM (%L) TO (%L)', partition, month, next_month);
+      EXECUTE format('INSERT INTO %I SELECT * FROM show_default WHERE start_time >= %L AND start_time < %L',
+        partition, month, next_month);
+      DELETE FROM show_default WHERE start_time >= month AND start_time < next_month;
+      ALTER TABLE show ATTACH PARTITION show_default DEFAULT;
+    ELSE
+      EXECUTE format('CREATE TABLE %I PARTITION OF show FOR VALUES FROM (%L) TO (%L)', partition, month, next_month);
+    END IF;
+    created := created + 1;
+  END LOOP;
+  RETURN created;
+END
+$$
+"""
+
+# Two shows in different monthly partitions can only overlap when the earlier
+# one runs past midnight at the end of its month (durations are capped at 24
+# hours), so the trigger only fires for rows near a month boundary. Both rows
+# of such a pair fire it, and the per-venue advisory lock makes the second
+# transaction wait for the first to commit before it looks, so concurrent
+# inserts cannot both pass. The error matches the exclusion constraints'.
+CHECK_CROSS_MONTH_OVERLAP = """
+CREATE FUNCTION show_check_cross_month_overlap() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(461209, NEW.venue_id);
+  IF EXISTS (
+    SELECT 1 FROM show s
+    WHERE s.venue_id = NEW.venue_id
+      AND date_trunc('month', s.start_time) <> date_trunc('month', NEW.start_time)
+      AND s.start_time > NEW.start_time - interval '24 hours'
+      AND s.start_time < NEW.start_time + NEW.duration
+      AND tsrange(s.start_time, s.start_time + s.duration) && tsrange(NEW.start_time, NEW.start_time + NEW.duration)
+  ) THEN
+    RAISE EXCEPTION 'show at venue % from % overlaps another show', NEW.venue_id, NEW.start_time
+      USING ERRCODE = 'exclusion_violation';
+  END IF;
+  RETURN NULL;
+END
+$$
+"""
+
+CROSS_MONTH_TRIGGER = (
+    'CREATE TRIGGER show_cross_month_overlap AFTER INSERT OR UPDATE OF venue_id, start_time, duration ON show '
+    'FOR EACH ROW WHEN ('
+    "date_trunc('month', NEW.start_time) <> date_trunc('month', NEW.start_time + NEW.duration) "
+    "OR NEW.start_time < date_trunc('month', NEW.start_time) + interval '24 hours'"
+    ') EXECUTE FUNCTION show_check_cross_month_overlap()'
+)
+
+
+def partitions():
+    return [row[0] for row in op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'show'::regclass ORDER BY c.relname"
+    ))]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('show', sa.Column('duration', sa.Interval(), nullable=False,
+        server_default=sa.text("interval '2 hours'")))
+    op.create_check_constraint('show_duration_check', 'show',
+        "duration > interval '0' AND duration <= interval '24 hours'")
+
+    # Existing overlaps would only surface as a bare constraint error on one
+    # partition; report them all up front instead.
+    overlaps = op.get_bind().execute(sa.text(
+        'SELECT a.venue_id, a.start_time, b.start_time FROM show a JOIN show b '
+        'ON b.venue_id = a.venue_id AND (b.start_time, b.artist_id) > (a.start_time, a.artist_id) '
+        'AND b.start_time < a.start_time + a.duration '
+        'ORDER BY a.venue_id, a.start_time LIMIT 20'
+    )).all()
+    if overlaps:
+        listing = '; '.join(f'venue {venueId}: {first} and {second}' for venueId, first, second in overlaps)
+        raise RuntimeError(f'Resolve overlapping shows before upgrading ({listing})')
+
+    for partition in partitions():
+        op.execute(f'ALTER TABLE {partition} ADD CONSTRAINT {partition}_no_overlap {NO_OVERLAP}')
+    op.execute(CREATE_SHOW_PARTITIONS)
+    op.execute(CHECK_CROSS_MONTH_OVERLAP)
+    op.execute(CROSS_MONTH_TRIGGER)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER show_cross_month_overlap ON show')
+    op.execute('DROP FUNCTION show_check_cross_month_overlap()')
+    op.execute(PREVIOUS_CREATE_SHOW_PARTITIONS)
+    for partition in partitions():
+        op.execute(f'ALTER TABLE {partition} DROP CONSTRAINT IF EXISTS {partition}_no_overlap')
+    op.drop_constraint('show_duration_check', 'show', type_='check')
+    op.drop_column('show', 'duration')
@@ -0,0 +1,30 @@
+"""add trigram indexes on venue and artist names
+
+Revision ID: b3f1c2a9d4e7
+Revises: 86de86382a33
+Create Date: 2026-10-17 09:12:31.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f1c2a9d4e7'
+down_revision = '86de86382a33'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm lets ILIKE '%term%' and similarity searches use a GIN index.
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_venue_name_trgm', 'venue', ['name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_artist_name_trgm', 'artist', ['name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_artist_name_trgm', table_name='artist')
+    op.drop_index('ix_venue_name_trgm', table_name='venue')
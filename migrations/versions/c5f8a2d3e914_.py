@@ -0,0 +1,27 @@
+"""index venues seeking talent by area for availability search
+
+Revision ID: c5f8a2d3e914
+Revises: a9c4e1f7b352
+Create Date: 2026-10-17 15:41:08.264913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f8a2d3e914'
+down_revision = 'a9c4e1f7b352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The show side of the search uses the GiST indexes behind each show
+    # partition's no-overlap exclusion constraint.
+    op.create_index('ix_venue_seeking_state_city', 'venue', ['state', sa.text('lower(city)')], unique=False,
+        postgresql_where=sa.text('seeking_talent'))
+
+
+def downgrade():
+    op.drop_index('ix_venue_seeking_state_city', table_name='venue')
@@ -0,0 +1,28 @@
+"""add composite schedule indexes on show
+
+Revision ID: c8e2d5f0a913
+Revises: b3f1c2a9d4e7
+Create Date: 2026-10-17 10:02:47.518360
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e2d5f0a913'
+down_revision = 'b3f1c2a9d4e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False,
+        postgresql_include=['artist_id'])
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False,
+        postgresql_include=['venue_id'])
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
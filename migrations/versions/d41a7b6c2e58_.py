@@ -0,0 +1,31 @@
+"""add updated_at and version to venue, artist and show
+
+Revision ID: d41a7b6c2e58
+Revises: c8e2d5f0a913
+Create Date: 2026-10-17 11:20:05.861442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41a7b6c2e58'
+down_revision = 'c8e2d5f0a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Server defaults backfill existing rows; the models maintain both columns on writes.
+    for table in ('venue', 'artist', 'show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+            server_default=sa.text("timezone('utc', now())")))
+        op.add_column(table, sa.Column('version', sa.Integer(), nullable=False,
+            server_default='1'))
+
+
+def downgrade():
+    for table in ('show', 'artist', 'venue'):
+        op.drop_column(table, 'version')
+        op.drop_column(table, 'updated_at')
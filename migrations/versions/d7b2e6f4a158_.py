@@ -0,0 +1,51 @@
+"""index genres and areas for faceted browsing, materialize unfiltered facets
+
+Revision ID: d7b2e6f4a158
+Revises: c5f8a2d3e914
+Create Date: 2026-10-17 16:12:45.093127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7b2e6f4a158'
+down_revision = 'c5f8a2d3e914'
+branch_labels = None
+depends_on = None
+
+
+FACET_VIEWS = [
+    ('venue_facets', 'venue', 'seeking_talent'),
+    ('artist_facets', 'artist', 'seeking_venue'),
+]
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        # GIN on the arrays answers genre containment (@>) and overlap (&&).
+        op.create_index(f'ix_{table}_genres', table, ['genres'], unique=False, postgresql_using='gin')
+        op.create_index(f'ix_{table}_state_city', table, ['state', sa.text('lower(city)')], unique=False)
+
+    # Unfiltered facet counts, refreshed with the upcoming show counters. The
+    # unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY.
+    for view, table, seeking in FACET_VIEWS:
+        op.execute(
+            f'CREATE MATERIALIZED VIEW {view} AS '
+            f'WITH matches AS (SELECT state, genres, {seeking} AS seeking FROM {table}) '
+            "SELECT 'genre'::text AS facet, genre::text AS value, count(*) AS count "
+            'FROM matches, unnest(matches.genres) AS genre GROUP BY genre '
+            "UNION ALL SELECT 'state', state, count(*) FROM matches GROUP BY state "
+            "UNION ALL SELECT 'total', '', count(*) FROM matches "
+            "UNION ALL SELECT 'seeking', '', count(*) FILTER (WHERE seeking) FROM matches"
+        )
+        op.execute(f'CREATE UNIQUE INDEX ix_{view}_facet_value ON {view} (facet, value)')
+
+
+def downgrade():
+    for view, table, seeking in FACET_VIEWS:
+        op.execute(f'DROP MATERIALIZED VIEW {view}')
+    for table in ('venue', 'artist'):
+        op.drop_index(f'ix_{table}_state_city', table_name=table)
+        op.drop_index(f'ix_{table}_genres', table_name=table)
@@ -0,0 +1,45 @@
+"""add materialized upcoming show counters
+
+Revision ID: e6b3f9d21c47
+Revises: d41a7b6c2e58
+Create Date: 2026-10-17 13:41:52.330917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b3f9d21c47'
+down_revision = 'd41a7b6c2e58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The unique indexes are required for REFRESH MATERIALIZED VIEW CONCURRENTLY.
+    op.execute(
+        'CREATE MATERIALIZED VIEW venue_upcoming_shows AS '
+        'SELECT venue_id, count(*) AS num_upcoming_shows FROM show '
+        'WHERE start_time > LOCALTIMESTAMP GROUP BY venue_id'
+    )
+    op.execute('CREATE UNIQUE INDEX ix_venue_upcoming_shows_venue_id ON venue_upcoming_shows (venue_id)')
+    op.execute(
+        'CREATE MATERIALIZED VIEW artist_upcoming_shows AS '
+        'SELECT artist_id, count(*) AS num_upcoming_shows FROM show '
+        'WHERE start_time > LOCALTIMESTAMP GROUP BY artist_id'
+    )
+    op.execute('CREATE UNIQUE INDEX ix_artist_upcoming_shows_artist_id ON artist_upcoming_shows (artist_id)')
+
+    op.create_table('counter_refresh',
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("INSERT INTO counter_refresh (name, refreshed_at) VALUES ('upcoming_shows', clock_timestamp())")
+
+
+def downgrade():
+    op.drop_table('counter_refresh')
+    op.execute('DROP MATERIALIZED VIEW artist_upcoming_shows')
+    op.execute('DROP MATERIALIZED VIEW venue_upcoming_shows')
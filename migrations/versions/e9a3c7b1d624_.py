@@ -0,0 +1,37 @@
+"""add coordinates to venues and artists with earthdistance indexes
+
+Revision ID: e9a3c7b1d624
+Revises: d7b2e6f4a158
+Create Date: 2026-10-17 16:48:19.640372
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9a3c7b1d624'
+down_revision = 'd7b2e6f4a158'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS cube')
+    op.execute('CREATE EXTENSION IF NOT EXISTS earthdistance')
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('latitude', sa.Float(), nullable=True))
+        op.add_column(table, sa.Column('longitude', sa.Float(), nullable=True))
+        op.create_check_constraint(f'{table}_location_check', table,
+            'latitude BETWEEN -90 AND 90 AND longitude BETWEEN -180 AND 180')
+        # A GiST index on the points as earth cubes serves radius searches
+        # (earth_box @>) and nearest-first ordering (<->) alike.
+        op.execute(f'CREATE INDEX ix_{table}_location ON {table} USING gist (ll_to_earth(latitude, longitude))')
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.drop_index(f'ix_{table}_location', table_name=table)
+        op.drop_constraint(f'{table}_location_check', table, type_='check')
+        op.drop_column(table, 'longitude')
+        op.drop_column(table, 'latitude')
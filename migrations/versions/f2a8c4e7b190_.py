@@ -0,0 +1,147 @@
+"""partition show by month of start_time
+
+Revision ID: f2a8c4e7b190
+Revises: e6b3f9d21c47
+Create Date: 2026-10-17 14:26:09.871254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8c4e7b190'
+down_revision = 'e6b3f9d21c47'
+branch_labels = None
+depends_on = None
+
+
+# Creates show_YYYY_MM partitions for every month from first_month to
+# last_month that does not have one yet, and returns how many it created.
+# Rows already parked in show_default for such a month are moved into the new
+# partition, since PostgreSQL refuses to attach a partition whose rows sit in
+# the default one.
+CREATE_SHOW_PARTITIONS = """
+CREATE FUNCTION create_show_partitions(first_month date, last_month date) RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+  month date;
+  next_month date;
+  partition text;
+  created integer := 0;
+BEGIN
+  FOR month IN
+    SELECT generate_series(date_trunc('month', first_month), date_trunc('month', last_month), interval '1 month')::date
+  LOOP
+    partition := 'show_' || to_char(month, 'YYYY_MM');
+    CONTINUE WHEN to_regclass(partition) IS NOT NULL;
+    next_month := (month + interval '1 month')::date;
+    IF EXISTS (SELECT 1 FROM show_default WHERE start_time >= month AND start_time < next_month) THEN
+      ALTER TABLE show DETACH PARTITION show_default;
+      EXECUTE format('CREATE TABLE %I PARTITION OF show FOR VALUES FROM (%L) TO (%L)', partition, month, next_month);
+      EXECUTE format('INSERT INTO %I SELECT * FROM show_default WHERE start_time >= %L AND start_time < %L',
+        partition, month, next_month);
+      DELETE FROM show_default WHERE start_time >= month AND start_time < next_month;
+      ALTER TABLE show ATTACH PARTITION show_default DEFAULT;
+    ELSE
+      EXECUTE format('CREATE TABLE %I PARTITION OF show FOR VALUES FROM (%L) TO (%L)', partition, month, next_month);
+    END IF;
+    created := created + 1;
+  END LOOP;
+  RETURN created;
+END
+$$
+"""
+
+UPCOMING_VIEWS = [
+    ('venue_upcoming_shows', 'venue_id'),
+    ('artist_upcoming_shows', 'artist_id'),
+]
+
+
+def drop_upcoming_views():
+    for view, key in UPCOMING_VIEWS:
+        op.execute(f'DROP MATERIALIZED VIEW {view}')
+
+
+def create_upcoming_views():
+    for view, key in UPCOMING_VIEWS:
+        op.execute(
+            f'CREATE MATERIALIZED VIEW {view} AS '
+            f'SELECT {key}, count(*) AS num_upcoming_shows FROM show '
+            f'WHERE start_time > LOCALTIMESTAMP GROUP BY {key}'
+        )
+        op.execute(f'CREATE UNIQUE INDEX ix_{view}_{key} ON {view} ({key})')
+
+
+def upgrade():
+    # The upcoming show views depend on show, so they are rebuilt around the swap.
+    drop_upcoming_views()
+    op.execute('ALTER TABLE show RENAME TO show_unpartitioned')
+    op.execute('ALTER INDEX show_pkey RENAME TO show_unpartitioned_pkey')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show_unpartitioned')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show_unpartitioned')
+
+    # A partitioned table's primary key must contain the partition key, so
+    # start_time joins it: an artist can now play a venue more than once.
+    op.execute(
+        'CREATE TABLE show ('
+        'artist_id integer NOT NULL REFERENCES artist (id), '
+        'venue_id integer NOT NULL REFERENCES venue (id), '
+        'start_time timestamp without time zone NOT NULL DEFAULT now(), '
+        "updated_at timestamp without time zone NOT NULL DEFAULT timezone('utc', now()), "
+        "version integer NOT NULL DEFAULT 1, "
+        'PRIMARY KEY (artist_id, venue_id, start_time)'
+        ') PARTITION BY RANGE (start_time)'
+    )
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False,
+        postgresql_include=['artist_id'])
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False,
+        postgresql_include=['venue_id'])
+    op.execute('CREATE TABLE show_default PARTITION OF show DEFAULT')
+    op.execute(CREATE_SHOW_PARTITIONS)
+    op.execute(
+        'SELECT create_show_partitions('
+        'coalesce((SELECT min(start_time) FROM show_unpartitioned), LOCALTIMESTAMP)::date, '
+        "(LOCALTIMESTAMP + interval '12 months')::date)"
+    )
+
+    # Shows saved before start_time was required fall back to their last update.
+    op.execute(
+        'INSERT INTO show (artist_id, venue_id, start_time, updated_at, version) '
+        'SELECT artist_id, venue_id, coalesce(start_time, updated_at), updated_at, version FROM show_unpartitioned'
+    )
+    op.execute('DROP TABLE show_unpartitioned')
+    op.execute('ANALYZE show')
+    create_upcoming_views()
+
+
+def downgrade():
+    # Only the latest show of each artist at each venue fits the old primary key.
+    drop_upcoming_views()
+    op.execute('ALTER TABLE show RENAME TO show_partitioned')
+    op.execute('ALTER INDEX show_pkey RENAME TO show_partitioned_pkey')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show_partitioned')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show_partitioned')
+    op.create_table('show',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text("timezone('utc', now())")),
+    sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ),
+    sa.PrimaryKeyConstraint('artist_id', 'venue_id')
+    )
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False,
+        postgresql_include=['artist_id'])
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False,
+        postgresql_include=['venue_id'])
+    op.execute(
+        'INSERT INTO show (artist_id, venue_id, start_time, updated_at, version) '
+        'SELECT DISTINCT ON (artist_id, venue_id) artist_id, venue_id, start_time, updated_at, version '
+        'FROM show_partitioned ORDER BY artist_id, venue_id, start_time DESC'
+    )
+    op.execute('DROP TABLE show_partitioned CASCADE')
+    op.execute('DROP FUNCTION create_show_partitions(date, date)')
+    create_upcoming_views()
@@ -0,0 +1,31 @@
+"""index the keyset pagination sort keys of the venue and show listings
+
+Revision ID: f3c1a8e2b705
+Revises: e9a3c7b1d624
+Create Date: 2026-10-17 18:21:05.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c1a8e2b705'
+down_revision = 'e9a3c7b1d624'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Columns in the order of VENUE_AREA_KEYS and SHOW_LIST_KEYS, so each page
+    # is a range scan of the index instead of a sort of the whole table. On
+    # the partitioned show table the index is created on every partition,
+    # and pages are read by merging the partitions' index scans.
+    op.create_index('ix_venue_state_city_name_id', 'venue', ['state', 'city', 'name', 'id'], unique=False)
+    op.create_index('ix_show_start_time_artist_id_venue_id', 'show', ['start_time', 'artist_id', 'venue_id'],
+        unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_artist_id_venue_id', table_name='show')
+    op.drop_index('ix_venue_state_city_name_id', table_name='venue')
@@ -0,0 +1,85 @@
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+from tasks import PeriodicTask
+
+
+# Monthly range partitions of the show table.
+#
+# show is partitioned by start_time into show_YYYY_MM tables, with
+# show_default catching anything outside them. Queries with a start_time
+# bound (upcoming shows, the schedule and list pages) only scan the matching
+# partitions. The create_show_partitions() SQL function from the partitioning
+# migration adds missing months, moving any rows parked in show_default into
+# them. PartitionMaintainer keeps SHOW_PARTITIONS_AHEAD months created in
+# advance, back to the earliest show parked in show_default so imported
+# history gets partitions of its own, and, with SHOW_PARTITION_RETENTION_MONTHS set, detaches partitions
+# older than that. Detached partitions stay as ordinary tables to archive or
+# drop; 'flask partitions' does either by hand.
+
+PARTITION_NAME = re.compile(r'^show_(\d{4})_(\d{2})$')
+
+# Arbitrary application-wide key for pg_advisory_xact_lock.
+PARTITION_LOCK_KEY = 461208
+
+
+def add_months(day, months):
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def create_show_partitions(engine, months_ahead, first_month=None):
+    # Create partitions from first_month (default this month), or from the
+    # earliest show in show_default if that is older, through months_ahead
+    # months from now. Returns the number of partitions created.
+    first = first_month or date.today()
+    with engine.begin() as connection:
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {"key": PARTITION_LOCK_KEY})
+        parked = connection.execute(text('SELECT min(start_time) FROM show_default')).scalar()
+        if parked is not None:
+            first = min(first, parked.date())
+        return connection.execute(
+            text('SELECT create_show_partitions(:first, :last)'),
+            {"first": first, "last": add_months(date.today(), months_ahead)}
+        ).scalar()
+
+
+def detach_show_partitions(engine, older_than_months, drop=False):
+    # Detach (and optionally drop) monthly partitions that end at least
+    # older_than_months before the current month. Returns their names.
+    cutoff = add_months(date.today().replace(day=1), -older_than_months)
+    detached = []
+    with engine.begin() as connection:
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {"key": PARTITION_LOCK_KEY})
+        partitions = connection.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'show'::regclass ORDER BY c.relname"
+        )).scalars().all()
+        for name in partitions:
+            match = PARTITION_NAME.match(name)
+            if not match or add_months(date(int(match.group(1)), int(match.group(2)), 1), 1) > cutoff:
+                continue
+            connection.execute(text(f'ALTER TABLE show DETACH PARTITION {name}'))
+            if drop:
+                connection.execute(text(f'DROP TABLE {name}'))
+            detached.append(name)
+    return detached
+
+
+class PartitionMaintainer(PeriodicTask):
+
+    name = 'show-partition-maintainer'
+
+    def enabled(self, config):
+        return config['SHOW_PARTITION_MAINTENANCE']
+
+    def interval(self, config):
+        return config['SHOW_PARTITION_CHECK_INTERVAL']
+
+    def run_once(self, engine):
+        config = self.app.config
+        create_show_partitions(engine, config['SHOW_PARTITIONS_AHEAD'])
+        if config['SHOW_PARTITION_RETENTION_MONTHS']:
+            detach_show_partitions(engine, config['SHOW_PARTITION_RETENTION_MONTHS'])
@@ -0,0 +1,177 @@
+import time
+
+from flask import g, has_request_context, jsonify, request, session
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event, text
+
+from dbpool import dispose_after_fork, pool_stats
+from tasks import PeriodicTask
+
+
+# Read replica routing.
+#
+# With DATABASE_REPLICA_URL set, the 'replica' bind is a second engine, and
+# GET and HEAD requests read from it while forms, deletes and every other
+# write go to the primary. Three things send a read back to the primary:
+#
+#   - a write in the last REPLICA_STICKY_SECONDS by the same browser, so people
+#     see their own changes (read-your-writes, kept in the signed session);
+#   - replica lag above REPLICA_MAX_LAG seconds, measured every
+#     REPLICA_LAG_CHECK_INTERVAL seconds by a background thread per worker as
+#     the time since the replica last had replayed everything the primary had
+#     written, so a standby that stopped receiving WAL drops out as soon as
+#     the primary moves on;
+#   - a failed lag check, or none yet since the worker started.
+#
+# To try it locally, run a second Postgres as a streaming standby of the first
+# (pg_basebackup -R -D <dir> from the primary, then start it on another port)
+# and point DATABASE_REPLICA_URL at it. A standalone second database works
+# too: it is never in recovery, so it always reports zero lag. /replica/stats
+# shows the last measured lag and the replica pool of the worker that answers.
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The primary's WAL position, read first, and whether the replica has
+# replayed up to it. Comparing against the primary rather than against what
+# the replica received means a disconnected standby is not mistaken for a
+# fresh one, while an idle primary still leaves its replica caught up. A
+# database that is not a standby at all always counts as caught up.
+# The position from the previous check is tested too, so a replica that
+# trails a busy primary by milliseconds still counts as at most one check
+# interval behind.
+PRIMARY_LSN = text('SELECT pg_current_wal_lsn()')
+REPLAYED_QUERY = text(
+    'SELECT NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn), '
+    'NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= CAST(:previous_lsn AS pg_lsn)'
+)
+
+
+class RoutingSession(FlaskSession):
+    # Reads go to the engine chosen for the request; flushes, INSERT, UPDATE
+    # and DELETE statements and work outside a request always use the primary.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        writing = self._flushing or getattr(clause, 'is_dml', False)
+        if bind is None and not writing and has_request_context():
+            engine = g.get('db_bind')
+            if engine is not None:
+                return engine
+        return super(RoutingSession, self).get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter(PeriodicTask):
+
+    name = 'replica-lag-monitor'
+
+    def __init__(self, app=None, db=None):
+        self.lag = None
+        self.checked_at = None
+        self.caught_up_at = None
+        self.previous = None
+        self.last_write = 0.0
+        super(ReplicaRouter, self).__init__(app, db)
+
+    def enabled(self, config):
+        return 'replica' in config.get('SQLALCHEMY_BINDS', {})
+
+    def interval(self, config):
+        return config['REPLICA_LAG_CHECK_INTERVAL']
+
+    def init_app(self, app, db):
+        super(ReplicaRouter, self).init_app(app, db)
+        self.config = app.config
+        if not self.enabled(app.config):
+            return
+        with app.app_context():
+            self.primary_engine = db.engine
+            self.replica_engine = db.engines['replica']
+        dispose_after_fork(self.replica_engine)
+        # RoutingSession is shared by every app built in the process (the async
+        # server, tests, benchmarks), so each hook is added only once.
+        for name, listener in (('after_flush', self.flushed), ('do_orm_execute', self.executed),
+                ('after_commit', self.committed), ('after_soft_rollback', self.rolled_back)):
+            if not event.contains(RoutingSession, name, listener):
+                event.listen(RoutingSession, name, listener)
+        app.before_request(self.choose_engine)
+        app.after_request(self.remember_write)
+        app.add_url_rule('/replica/stats', 'replica_stats', self.stats_view)
+
+    def engine(self):
+        return self.replica_engine
+
+    def run_once(self, engine):
+        # Lag is the time since the replica was last seen caught up, and
+        # unknown (so the replica is unused) until it has been once.
+        try:
+            readAt = time.time()
+            with self.primary_engine.connect() as primary:
+                lsn = primary.execute(PRIMARY_LSN).scalar()
+            previousLsn, previousReadAt = self.previous or (lsn, readAt)
+            with engine.connect() as connection:
+                caughtUp, caughtUpBefore = connection.execute(REPLAYED_QUERY,
+                    {"lsn": lsn, "previous_lsn": previousLsn}).one()
+            self.previous = (lsn, readAt)
+            if caughtUp:
+                self.caught_up_at = readAt
+            elif caughtUpBefore:
+                self.caught_up_at = max(self.caught_up_at or 0, previousReadAt)
+            self.lag = None if self.caught_up_at is None else max(0.0, time.time() - self.caught_up_at)
+        except Exception:
+            self.lag = None
+            raise
+        finally:
+            self.checked_at = time.time()
+
+    def healthy(self):
+        return self.lag is not None and self.lag <= self.config['REPLICA_MAX_LAG']
+
+    def choose_engine(self):
+        g.db_role = 'primary'
+        if request.method not in READ_METHODS or session.get('primary_until', 0) > time.time():
+            return
+        if not self.healthy():
+            return
+        g.db_role = 'replica'
+        g.db_bind = self.replica_engine
+
+    def flushed(self, dbSession, flushContext):
+        dbSession.info['replica_pending_write'] = True
+
+    def executed(self, executeState):
+        # Bulk INSERT, UPDATE and DELETE statements run without a flush.
+        if executeState.is_insert or executeState.is_update or executeState.is_delete:
+            executeState.session.info['replica_pending_write'] = True
+
+    def committed(self, dbSession):
+        # Only commits that wrote something make the replica stale.
+        if not dbSession.info.pop('replica_pending_write', False):
+            return
+        self.last_write = time.time()
+        if has_request_context():
+            g.db_wrote = True
+
+    def rolled_back(self, dbSession, previousTransaction):
+        dbSession.info.pop('replica_pending_write', None)
+
+    def recently_written(self):
+        # True while a write made by this worker may not have reached the
+        # replica yet; pages read from the replica then are not worth caching.
+        return time.time() - self.last_write < self.config['REPLICA_STICKY_SECONDS']
+
+    def remember_write(self, response):
+        if g.pop('db_wrote', False):
+            session['primary_until'] = time.time() + self.config['REPLICA_STICKY_SECONDS']
+        if self.config['REPLICA_ROLE_HEADER']:
+            response.headers['X-DB-Role'] = g.get('db_role', 'primary')
+        return response
+
+    def stats_view(self):
+        stats = pool_stats(self.replica_engine)
+        stats.update({
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.config['REPLICA_MAX_LAG'],
+            "healthy": self.healthy(),
+            "checked_at": self.checked_at
+        })
+        return jsonify(stats)
+
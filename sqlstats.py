@@ -0,0 +1,123 @@
+import heapq
+import logging
+import re
+import time
+from collections import Counter
+from logging import Formatter, FileHandler
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+
+# Per-request SQL instrumentation.
+#
+# Every statement run while handling a request is counted and timed through
+# SQLAlchemy engine events. After the request, requests over the configured
+# statement count or database time are written to the slow query log, and a
+# normalized statement repeated more than N_PLUS_ONE_THRESHOLD times is
+# flagged as a likely N+1 query. With SQL_STATS_HEADER on, the numbers are
+# also returned in an X-DB-Stats response header.
+
+NUMBER = re.compile(r'\b\d+(\.\d+)?\b')
+STRING = re.compile(r"'(?:[^']|'')*'")
+PARAMETER_LIST = re.compile(r'\(\s*(%\([^)]+\)s|\?|\$\d+|:\w+)(\s*,\s*(%\([^)]+\)s|\?|\$\d+|:\w+))*\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_statement(statement):
+    # Collapse literals and expanded IN lists so repeats of one query shape
+    # with different arguments count as the same statement.
+    statement = STRING.sub('?', statement)
+    statement = NUMBER.sub('?', statement)
+    statement = PARAMETER_LIST.sub('(?)', statement)
+    return WHITESPACE.sub(' ', statement).strip()
+
+
+class RequestSqlStats(object):
+
+    def __init__(self, keep_slowest):
+        self.keep_slowest = keep_slowest
+        self.count = 0
+        self.total = 0.0
+        self.statements = Counter()
+        self._slowest = []
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.total += seconds
+        self.statements[normalize_statement(statement)] += 1
+        entry = (seconds, self.count, statement)
+        if len(self._slowest) < self.keep_slowest:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def slowest(self):
+        return [(seconds, statement) for seconds, _, statement in sorted(self._slowest, reverse=True)]
+
+    def repeated(self, threshold):
+        return [(statement, count) for statement, count in self.statements.most_common() if count > threshold]
+
+
+class SqlStats(object):
+
+    def __init__(self, app=None, db=None):
+        self.logger = logging.getLogger('fyyur.slow_queries')
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        if not app.config['SQL_STATS_ENABLED']:
+            return
+        if app.config['SLOW_QUERY_LOG'] and not self.logger.handlers:
+            handler = FileHandler(app.config['SLOW_QUERY_LOG'])
+            handler.setFormatter(Formatter('%(asctime)s %(levelname)s: %(message)s'))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+        # Only this app's engines are timed, so apps built side by side (the
+        # async server, tests, benchmarks) do not time each other's queries.
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            if not event.contains(engine, 'before_cursor_execute', self.before_cursor_execute):
+                event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+
+    def start_request(self):
+        g.sql_stats = RequestSqlStats(current_app.config['SQL_STATS_SLOWEST'])
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the statement's execution context: a statement that raises
+        # never reaches after_cursor_execute, and anything kept on the pooled
+        # connection would then be paired with a later statement.
+        if context is not None:
+            context._sql_stats_start = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_sql_stats_start', None)
+        if started is not None and has_request_context() and 'sql_stats' in g:
+            g.sql_stats.record(statement, time.perf_counter() - started)
+
+    def finish_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        config = current_app.config
+        repeated = stats.repeated(config['N_PLUS_ONE_THRESHOLD'])
+        totalMs = stats.total * 1000
+        if repeated:
+            for statement, count in repeated:
+                self.logger.warning(f'Possible N+1 in {request.method} {request.full_path}: {count} x {statement}')
+        if totalMs > config['SLOW_REQUEST_DB_MS'] or stats.count > config['SLOW_REQUEST_STATEMENTS']:
+            slowest = '; '.join(f'{seconds * 1000:.1f}ms {statement}' for seconds, statement in stats.slowest())
+            self.logger.info(
+                f'Slow request {request.method} {request.full_path}: {stats.count} statements, '
+                f'{totalMs:.1f}ms in database. Slowest: {slowest}'
+            )
+
+        if config['SQL_STATS_HEADER']:
+            response.headers['X-DB-Stats'] = f'statements={stats.count}; time_ms={totalMs:.1f}; n_plus_one={len(repeated)}'
+        return response
@@ -0,0 +1,64 @@
+import logging
+import os
+import threading
+
+
+# Periodic database maintenance inside the web workers.
+#
+# A PeriodicTask runs run_once(engine) every interval seconds on a daemon
+# thread. The thread is started by the first request each process serves
+# rather than at import, since threads do not survive a fork into worker
+# processes. Tasks that must run in only one process at a time take their own
+# advisory lock in run_once.
+
+logger = logging.getLogger('fyyur.tasks')
+
+
+class PeriodicTask(object):
+
+    name = 'periodic-task'
+
+    def __init__(self, app=None, db=None):
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.app = app
+        self.db = db
+        if self.enabled(app.config):
+            app.before_request(self.ensure_started)
+
+    def enabled(self, config):
+        raise NotImplementedError
+
+    def interval(self, config):
+        raise NotImplementedError
+
+    def run_once(self, engine):
+        raise NotImplementedError
+
+    def engine(self):
+        # The engine handed to run_once; read while a request is active, since
+        # the thread has no application context of its own.
+        return self.db.engine
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            thread = threading.Thread(target=self.run, args=(self.engine(),), name=self.name, daemon=True)
+            thread.start()
+
+    def run(self, engine):
+        interval = self.interval(self.app.config)
+        while not self._stop.wait(interval):
+            try:
+                self.run_once(engine)
+            except Exception:
+                logger.exception(f'{self.name} failed')
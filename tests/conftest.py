@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+import pytest
+
+import config
+
+
+# View tests run against a real app built by create_app, with the query
+# functions a test needs replaced, so no database is required. Background
+# tasks, the response cache and SQL instrumentation are off.
+
+def app_config(**overrides):
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    settings.update(
+        TESTING=True,
+        SECRET_KEY='test',
+        RESPONSE_CACHE_ENABLED=False,
+        SQL_STATS_ENABLED=False,
+        UPCOMING_COUNTS_REFRESH=False,
+        SHOW_PARTITION_MAINTENANCE=False,
+        SQLALCHEMY_BINDS={},
+    )
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+
+@pytest.fixture
+def app():
+    # Imported here so tests of modules that do not need Flask run without it.
+    import app as fyyur
+    return fyyur.create_app(app_config())
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
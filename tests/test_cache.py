@@ -0,0 +1,66 @@
+import pytest
+
+import cache
+from cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_the_ttl(clock):
+    responses = ResponseCache(ttl=60)
+    responses.set('/venues', 'page', 4)
+    clock[0] += 59
+    assert responses.get('/venues') == 'page'
+    clock[0] += 1
+    assert responses.get('/venues') is None
+    assert responses.stats()['expirations'] == 1
+    assert responses.stats()['entries'] == 0
+
+
+def test_least_recently_used_entry_is_evicted_first(clock):
+    responses = ResponseCache(max_entries=2)
+    responses.set('a', 'A', 1)
+    responses.set('b', 'B', 1)
+    responses.get('a')
+    responses.set('c', 'C', 1)
+    assert responses.get('b') is None
+    assert responses.get('a') == 'A'
+    assert responses.get('c') == 'C'
+    assert responses.stats()['evictions'] == 1
+
+
+def test_entries_are_evicted_to_stay_under_max_bytes(clock):
+    responses = ResponseCache(max_bytes=10)
+    responses.set('a', 'A', 6)
+    responses.set('b', 'B', 6)
+    assert responses.get('a') is None
+    assert responses.stats()['bytes'] == 6
+    responses.set('huge', 'H', 11)
+    assert responses.get('huge') is None
+    assert responses.get('b') == 'B'
+
+
+def test_invalidate_drops_only_tagged_entries(clock):
+    responses = ResponseCache()
+    responses.set('/venues', 'list', 1, tags=('venues',))
+    responses.set('/venues/1', 'one', 1, tags=('venue:1',))
+    responses.set('/venues/2', 'two', 1, tags=('venue:2',))
+    responses.invalidate('venues', 'venue:1')
+    assert responses.get('/venues') is None
+    assert responses.get('/venues/1') is None
+    assert responses.get('/venues/2') == 'two'
+    assert responses.stats()['invalidations'] == 2
+
+
+def test_replacing_an_entry_drops_its_old_tags(clock):
+    responses = ResponseCache()
+    responses.set('/shows', 'old', 1, tags=('venue:1',))
+    responses.set('/shows', 'new', 1, tags=('venue:2',))
+    responses.invalidate('venue:1')
+    assert responses.get('/shows') == 'new'
+    assert responses.stats()['bytes'] == 1
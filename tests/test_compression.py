@@ -0,0 +1,60 @@
+import gzip
+
+import pytest
+
+flask = pytest.importorskip('flask')
+
+import compression
+
+
+BODY = 'Fyyur ' * 1000
+
+
+@pytest.fixture
+def client():
+    app = flask.Flask(__name__)
+    app.config.from_object('config')
+    compression.Compression(app)
+
+    @app.route('/page')
+    def page():
+        return flask.request.args.get('body', BODY)
+
+    @app.route('/file')
+    def file():
+        return flask.Response(b'\x89PNG', mimetype='image/png')
+
+    return app.test_client()
+
+
+def test_gzip_is_used_without_brotli(client, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    response = client.get('/page', headers={"Accept-Encoding": 'br, gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode() == BODY
+
+
+def test_brotli_wins_ties():
+    pytest.importorskip('brotli')
+    from werkzeug.datastructures import Accept
+    from werkzeug.http import parse_accept_header
+    encodings = parse_accept_header('gzip, br', Accept)
+    assert compression.Compression().negotiate(encodings) == 'br'
+
+
+def test_identity_is_sent_when_nothing_is_accepted(client):
+    response = client.get('/page', headers={"Accept-Encoding": 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_small_bodies_are_not_compressed_but_vary(client):
+    response = client.get('/page?body=short', headers={"Accept-Encoding": 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_other_content_types_do_not_vary(client):
+    response = client.get('/file', headers={"Accept-Encoding": 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Vary' not in response.headers
@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from geocode import Gazetteer
+
+
+CENSUS_PLACES = (
+    'USPS\tGEOID\tNAME\tALAND\tINTPTLAT\tINTPTLONG\n'
+    'TX\t4805000\tAustin city\t0\t30.2711\t-97.7437\n'
+    'TN\t4752006\tNashville-Davidson metropolitan government (balance)\t0\t36.1715\t-86.7842\n'
+    'MN\t2758000\tSt. Paul city\t0\t44.9489\t-93.1041\n'
+)
+ZIPS = 'zip,lat,lng\n78701-1234,30.2700,-97.7400\n'
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    places = tmp_path / 'places.txt'
+    places.write_text(CENSUS_PLACES)
+    zips = tmp_path / 'zips.csv'
+    zips.write_text(ZIPS)
+    gazetteer = Gazetteer()
+    assert gazetteer.load(str(places)) == 3
+    assert gazetteer.load(str(zips)) == 1
+    return gazetteer
+
+
+def test_census_legal_descriptions_are_dropped(gazetteer):
+    assert gazetteer.locate('Austin', 'tx') == (30.2711, -97.7437)
+    assert gazetteer.locate('Nashville-Davidson', 'TN') == (36.1715, -86.7842)
+
+
+def test_consolidated_names_are_found_by_their_first_part(gazetteer):
+    assert gazetteer.locate('Nashville', 'TN') == (36.1715, -86.7842)
+
+
+def test_abbreviations_are_spelled_out(gazetteer):
+    assert gazetteer.locate('Saint Paul', 'MN') == gazetteer.locate('St Paul', 'MN') == (44.9489, -93.1041)
+
+
+def test_zip_code_in_address_wins_over_city(gazetteer):
+    assert gazetteer.locate('Austin', 'TX', '123 Congress Ave, Austin, TX 78701') == (30.27, -97.74)
+    assert gazetteer.locate('Austin', 'TX', '123 Congress Ave 99999') == (30.2711, -97.7437)
+
+
+def test_locate_query(gazetteer):
+    assert gazetteer.locate_query('78701') == (30.27, -97.74)
+    assert gazetteer.locate_query('austin, tx') == (30.2711, -97.7437)
+    assert gazetteer.locate_query('Springfield') is None
+    assert gazetteer.locate_query(None) is None
+
+
+def test_files_without_coordinates_are_rejected(tmp_path):
+    path = tmp_path / 'bad.csv'
+    path.write_text('city,state\nAustin,TX\n')
+    with pytest.raises(ValueError):
+        Gazetteer().load(str(path))
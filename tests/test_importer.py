@@ -0,0 +1,105 @@
+import csv
+import os
+import uuid
+
+import pytest
+
+import importer
+
+
+SHOW = importer.ENTITIES['show']
+
+
+def test_show_statements_only_cast_through_try_timestamp():
+    # A bare ::timestamp cast on an impossible date aborts the whole file.
+    for sql in (importer.validation_sql('show', SHOW), importer.merge_sql('show', SHOW, False)):
+        assert '::timestamp' not in sql
+        assert 'try_timestamp(trim(s.start_time))' in sql
+
+
+def test_staged_start_time_checks_format_before_casting():
+    expression = importer.staged_start_time('o')
+    assert expression.index('~') < expression.index('try_timestamp')
+
+
+def test_validation_reports_overlaps_within_the_file():
+    sql = importer.validation_sql('show', SHOW)
+    assert 'overlaps another show in this file' in sql
+    assert 'PARTITION BY venue_name' in sql
+
+
+def test_venue_validation_checks_required_and_boolean_columns():
+    sql = importer.validation_sql('venue', importer.ENTITIES['venue'])
+    for column in importer.ENTITIES['venue']['required']:
+        assert f"'{column} is required'" in sql
+    assert "'seeking_talent is not a boolean'" in sql
+
+
+def test_merge_updates_existing_rows_only_when_asked():
+    venue = importer.ENTITIES['venue']
+    assert 'DO NOTHING' in importer.merge_sql('venue', venue, False)
+    updating = importer.merge_sql('venue', venue, True)
+    assert 'city = EXCLUDED.city' in updating
+    assert 'name = EXCLUDED.name' not in updating
+    assert 'version = venue.version + 1' in updating
+
+
+def test_check_columns_rejects_unknown_and_missing_columns():
+    assert importer.check_columns(SHOW, [' artist_name', 'venue_name', 'start_time ']) == ['artist_name', 'venue_name', 'start_time']
+    with pytest.raises(importer.CatalogImportError):
+        importer.check_columns(SHOW, ['artist_name', 'venue_name', 'when'])
+
+
+def test_csv_value_encodes_genres_and_booleans():
+    assert importer.csv_value('genres', ['Jazz', 'Blues']) == 'Jazz;Blues'
+    assert importer.csv_value('seeking_talent', True) == 'true'
+    assert importer.csv_value('phone', None) is None
+
+
+# The rest runs the importer against a scratch database migrated to head.
+
+@pytest.fixture
+def connection():
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('set TEST_DATABASE_URL to a migrated scratch database')
+    psycopg2 = pytest.importorskip('psycopg2')
+    connection = psycopg2.connect(url)
+    yield connection
+    connection.close()
+
+
+def write_csv(path, header, rows):
+    with open(path, 'w', newline='') as csvFile:
+        writer = csv.writer(csvFile)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_impossible_show_times_are_reported_per_row(connection, tmp_path):
+    suffix = uuid.uuid4().hex[:8]
+    venue, artist = f'Import Test Hall {suffix}', f'Import Test Band {suffix}'
+    try:
+        importer.import_file(connection, 'venue', write_csv(tmp_path / 'venues.csv',
+            ['name', 'city', 'state', 'address', 'phone', 'genres'],
+            [[venue, 'Austin', 'TX', '1 Main St', '512-555-0100', 'Jazz']]))
+        importer.import_file(connection, 'artist', write_csv(tmp_path / 'artists.csv',
+            ['name', 'city', 'state', 'genres'], [[artist, 'Austin', 'TX', 'Jazz']]))
+        report = importer.import_file(connection, 'show', write_csv(tmp_path / 'shows.csv',
+            ['artist_name', 'venue_name', 'start_time'],
+            [[artist, venue, '2030-01-01 20:00'], [artist, venue, '2030-02-30 20:00'], [artist, venue, '2030-01-05 25:99']]))
+
+        assert report['failed'] is None
+        assert report['inserted'] == 1
+        assert report['errors'] == 2
+        with open(report['error_report'], newline='') as errorFile:
+            reasons = [row['reason'] for row in csv.DictReader(errorFile)]
+        assert reasons == ['start_time is not a timestamp'] * 2
+    finally:
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM show WHERE venue_id IN (SELECT id FROM venue WHERE name = %s)', (venue,))
+        cursor.execute('DELETE FROM venue WHERE name = %s', (venue,))
+        cursor.execute('DELETE FROM artist WHERE name = %s', (artist,))
+        connection.commit()
+        cursor.close()
@@ -0,0 +1,52 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('flask')
+
+import app as fyyur
+from werkzeug.datastructures import MultiDict
+
+
+def test_cursor_round_trips_datetimes():
+    values = [datetime(2026, 3, 1, 20, 30), 4, 7]
+    cursor = fyyur.encode_cursor(values)
+    assert fyyur.decode_cursor(cursor, fyyur.SHOW_LIST_KEYS) == values
+
+
+@pytest.mark.parametrize('cursor', [None, '', 'not base64!', fyyur.encode_cursor(['Austin', 3])])
+def test_missing_or_malformed_cursor_decodes_to_none(cursor):
+    # The last one has the wrong number of values for the keys.
+    assert fyyur.decode_cursor(cursor, fyyur.VENUE_AREA_KEYS) is None
+
+
+def rows(*ids):
+    # One extra row past the limit means there is another page.
+    return [SimpleNamespace(name=f'Venue {id}', id=id) for id in ids]
+
+
+def test_first_page_links_only_forward():
+    page, links = fyyur.keyset_rows(rows(1, 2, 3), (fyyur.VENUE_NAME_KEYS, 2, None, None))
+    assert [row.id for row in page] == [1, 2]
+    assert links['prev'] is None
+    assert fyyur.decode_cursor(links['next'], fyyur.VENUE_NAME_KEYS) == ['Venue 2', 2]
+
+
+def test_last_page_links_only_back():
+    page, links = fyyur.keyset_rows(rows(3, 4), (fyyur.VENUE_NAME_KEYS, 2, ['Venue 2', 2], None))
+    assert links['next'] is None
+    assert fyyur.decode_cursor(links['prev'], fyyur.VENUE_NAME_KEYS) == ['Venue 3', 3]
+
+
+def test_paging_back_reverses_rows():
+    # Before a cursor, rows are fetched in descending order.
+    page, links = fyyur.keyset_rows(rows(4, 3, 2), (fyyur.VENUE_NAME_KEYS, 2, None, ['Venue 5', 5]))
+    assert [row.id for row in page] == [3, 4]
+    assert fyyur.decode_cursor(links['prev'], fyyur.VENUE_NAME_KEYS) == ['Venue 3', 3]
+    assert fyyur.decode_cursor(links['next'], fyyur.VENUE_NAME_KEYS) == ['Venue 4', 4]
+
+
+def test_page_args_keep_filters_and_drop_the_cursor():
+    args = MultiDict([('genre', 'Jazz'), ('genre', 'Blues'), ('after', 'abc'), ('limit', '10')])
+    assert fyyur.page_args(args, limit=None, before='xyz') == {"genre": ['Jazz', 'Blues'], "before": 'xyz'}
@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip('flask')
+
+from sqlstats import normalize_statement
+
+
+def test_literals_are_collapsed():
+    assert normalize_statement("SELECT * FROM venue WHERE city = 'O''Hare' AND id = 42") == \
+        'SELECT * FROM venue WHERE city = ? AND id = ?'
+
+
+def test_expanded_in_lists_count_as_one_statement():
+    short = normalize_statement('SELECT * FROM artist WHERE id IN (%(id_1)s)')
+    long = normalize_statement('SELECT * FROM artist WHERE id IN (%(id_1)s, %(id_2)s,\n  %(id_3)s)')
+    assert short == long == 'SELECT * FROM artist WHERE id IN (?)'
+
+
+def test_identifiers_with_digits_are_kept():
+    assert normalize_statement('SELECT show_2026_03.start_time FROM show_2026_03') == \
+        'SELECT show_2026_03.start_time FROM show_2026_03'
@@ -0,0 +1,90 @@
+import app as fyyur
+
+
+AREAS = [{"city": 'Austin', "state": 'TX', "venues": [{"id": 1, "name": 'The Velvet Hall', "num_upcoming_shows": 2}]}]
+PAGE = {"next": None, "prev": None}
+
+
+def stub_venue_listing(monkeypatch, calls):
+    def venue_areas(after=None, before=None, conditions=()):
+        calls.append(list(conditions))
+        return AREAS, PAGE
+
+    def nearest(model, origin, limit, miles=None):
+        return [{"id": 1, "name": 'The Velvet Hall', "city": 'Austin', "state": 'TX', "distance_miles": 1.2}]
+
+    monkeypatch.setattr(fyyur, 'venue_areas', venue_areas)
+    monkeypatch.setattr(fyyur, 'nearest', nearest)
+
+
+def test_venues_without_location(client, monkeypatch):
+    calls = []
+    stub_venue_listing(monkeypatch, calls)
+    response = client.get('/venues')
+    assert response.status_code == 200
+    assert b'The Velvet Hall' in response.data
+    assert b'Closest to' not in response.data
+    assert calls == [[]]
+
+
+def test_venues_near_place(client, monkeypatch):
+    calls = []
+    stub_venue_listing(monkeypatch, calls)
+    monkeypatch.setattr(fyyur.geocoder, 'locate_query', lambda query: (30.27, -97.74) if query == 'Austin, TX' else None)
+    response = client.get('/venues?near=Austin, TX&within=10')
+    assert response.status_code == 200
+    assert b'Closest to Austin, TX' in response.data
+    assert b'1.2 mi' in response.data
+    assert len(calls[0]) == 1
+
+
+def test_venues_near_coordinates(client, monkeypatch):
+    calls = []
+    stub_venue_listing(monkeypatch, calls)
+    response = client.get('/venues?lat=30.27&lng=-97.74')
+    assert response.status_code == 200
+    assert b'Closest to' in response.data
+
+
+def test_venues_near_unknown_place(client, monkeypatch):
+    calls = []
+    stub_venue_listing(monkeypatch, calls)
+    monkeypatch.setattr(fyyur.geocoder, 'locate_query', lambda query: None)
+    response = client.get('/venues?near=Atlantis')
+    assert response.status_code == 200
+    assert b'Could not find a place called' in response.data
+
+
+def test_show_artist_error_is_not_served_with_validators(client, monkeypatch):
+    artist = fyyur.Artist(id=1, name='Wild Static Band 1', city='Austin', state='TX', genres=['Jazz'])
+
+    def artist_detail(artist, current_time, schedule=None):
+        raise RuntimeError('schedule query failed')
+
+    monkeypatch.setattr(fyyur, 'entity_validators', lambda *args: (artist, 'etag', fyyur.datetime(2026, 1, 1)))
+    monkeypatch.setattr(fyyur, 'artist_detail', artist_detail)
+    response = client.get('/artists/1')
+    assert response.status_code == 404
+    assert response.headers.get('ETag') is None
+
+
+def test_show_artist_lookup_error(client, monkeypatch):
+    def entity_validators(*args):
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(fyyur, 'entity_validators', entity_validators)
+    assert client.get('/artists/1').status_code == 404
+
+
+def test_validators_change_when_a_linked_artist_changes():
+    venue = fyyur.Venue(id=1, name='The Velvet Hall', version=3, updated_at=fyyur.datetime(2026, 1, 1))
+    showsUpdatedAt = fyyur.datetime(2026, 2, 1)
+    before = fyyur.validators_from_row(fyyur.Venue, (venue, showsUpdatedAt, fyyur.datetime(2026, 3, 1), 4, 1))
+    after = fyyur.validators_from_row(fyyur.Venue, (venue, showsUpdatedAt, fyyur.datetime(2026, 4, 1), 4, 1))
+    assert before[1] != after[1]
+    assert after[2] == fyyur.datetime(2026, 4, 1)
+
+
+def test_validators_without_shows_use_the_entity():
+    venue = fyyur.Venue(id=1, name='The Velvet Hall', version=1, updated_at=fyyur.datetime(2026, 1, 1))
+    assert fyyur.validators_from_row(fyyur.Venue, (venue, None, None, 0, 0))[2] == fyyur.datetime(2026, 1, 1)